@@ -0,0 +1,65 @@
+"""Microbenchmark for URL template rendering.
+
+Compares the per-URL cost of building a new jinja2 environment for
+every URL, the memoized string template renderer, and the fast path
+used for the default URL templates.
+
+    $ python -m benchmarks.bench_urls [--pages N]
+
+"""
+
+import argparse
+import timeit
+
+from jinja2 import Environment
+
+from litesite.content import Page, Section
+from litesite.filters import filters
+from litesite.renderers import PAGE_URL, Renderer, render_url
+
+OVERRIDE_URL = "posts/{{ page|date('%Y') }}/{{ page|slug }}"
+
+
+def uncached(string, args):
+    """Render a string template the way litesite did before memoization."""
+
+    env = Environment()
+    env.filters.update(filters)
+
+    return env.from_string(string).render(**args)
+
+
+def make_pages(n):
+    section = Section("posts", "posts", None, None)
+    metadata = lambda i: {
+        "slug": f"post-{i}",
+        "title": f"Post {i}",
+        "date": "2020-01-01",
+    }
+
+    return [Page(f"post-{i}", "", metadata(i), section) for i in range(n)]
+
+
+def bench(label, func, pages):
+    seconds = timeit.timeit(lambda: [func({"page": page}) for page in pages], number=1)
+    print(f"{label:<32} {seconds / len(pages) * 1e6:10.2f} us/url")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages)
+
+    bench("default, new environment", lambda a: uncached(PAGE_URL, a), pages)
+    bench(
+        "default, memoized", lambda a: Renderer.render_from_string(PAGE_URL, a), pages
+    )
+    bench("default, fast path", lambda a: render_url(PAGE_URL, a), pages)
+    bench("override, new environment", lambda a: uncached(OVERRIDE_URL, a), pages)
+    bench("override, memoized", lambda a: render_url(OVERRIDE_URL, a), pages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Synthetic site generator for benchmarks.
+
+Generates a content directory, templates, and a config file for a site
+of a given shape. Output is deterministic for a given seed.
+
+    $ python -m benchmarks.generate DIR [--pages N] [--depth D] ...
+
+"""
+
+import argparse
+import os
+import random
+
+import yaml
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam "
+    "quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo"
+).split()
+
+CODE = '''```python
+def fibonacci(n):
+    """Return the nth Fibonacci number."""
+    a, b = 0, 1
+    for _ in range({n}):
+        a, b = b, a + b
+    return a
+```
+'''
+
+TEMPLATES = {
+    "simple": {
+        "page.html": "<html><body>{{ page.content }}</body></html>",
+        "category.html": "{% for item in category.sorted %}{{ item.value }}{% endfor %}",
+        "item.html": "{% for page in item.pages %}{{ page.url }}{% endfor %}",
+    },
+    "medium": {
+        "page.html": (
+            "<html><body><h1>{{ page.metadata.title }}</h1>"
+            "<time>{{ page|date('%Y-%m-%d') }}</time>{{ page.content }}"
+            "{% if not page.is_index %}"
+            "{% if page.prev %}<a href='/{{ page.prev.url }}'>prev</a>{% endif %}"
+            "{% if page.next %}<a href='/{{ page.next.url }}'>next</a>{% endif %}"
+            "{% else %}<ul>{% for p in page.section.sorted %}"
+            "<li><a href='/{{ p.url }}'>{{ p.metadata.title }}</a></li>"
+            "{% endfor %}</ul>{% endif %}</body></html>"
+        ),
+        "category.html": (
+            "<ul>{% for item in category.sorted %}"
+            "<li><a href='/{{ item.url }}'>{{ item.value }}</a> ({{ item.count }})</li>"
+            "{% endfor %}</ul>"
+        ),
+        "item.html": (
+            "<ul>{% for page in item.sorted %}"
+            "<li><a href='/{{ page.url }}'>{{ page.metadata.title }}</a></li>"
+            "{% endfor %}</ul>"
+        ),
+    },
+}
+
+TEMPLATES["complex"] = dict(
+    TEMPLATES["medium"],
+    **{
+        "page.html": TEMPLATES["medium"]["page.html"].replace(
+            "</body>",
+            "<nav>{% for category in site.categories %}{% for item in category.sorted %}"
+            "<a href='/{{ item.url }}'>{{ item.value }} {{ item.count }}</a>"
+            "{% endfor %}{% endfor %}</nav></body>",
+        )
+    },
+)
+
+
+def words(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def page_text(rng, i, categories, tags, code):
+    """Return the markdown source of a synthetic page."""
+
+    metadata = {
+        "title": f"Page {i} {words(rng, 3)}",
+        "slug": f"page-{i}",
+        "date": f"{2000 + i % 20}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+    }
+    for name in range(categories):
+        metadata[f"cat{name}"] = rng.sample(tags, min(3, len(tags)))
+
+    paragraphs = [words(rng, rng.randint(30, 80)) for _ in range(rng.randint(3, 8))]
+    for _ in range(code):
+        paragraphs.insert(rng.randrange(len(paragraphs) + 1), CODE.format(n=i))
+
+    front = yaml.safe_dump(metadata, default_flow_style=False)
+    return f"---\n{front}---\n\n" + "\n\n".join(paragraphs) + "\n"
+
+
+def section_dirs(root, depth, width):
+    """Return section directories for a tree `depth` levels deep."""
+
+    dirs = [root]
+    level = [root]
+    for d in range(depth):
+        level = [os.path.join(p, f"s{d}{i}") for p in level for i in range(width)]
+        dirs += level
+
+    return dirs
+
+
+def generate(
+    root,
+    pages=1000,
+    depth=2,
+    width=3,
+    categories=1,
+    tags=50,
+    code=0.2,
+    templates="medium",
+    seed=0,
+):
+    """Generate a synthetic site under `root` and return its settings.
+
+    `code` is the average number of fenced code blocks per page.
+
+    """
+
+    rng = random.Random(seed)
+    content = os.path.join(root, "content")
+    dirs = section_dirs(content, depth, width)
+    for path in dirs:
+        os.makedirs(path, exist_ok=True)
+
+    vocabulary = [f"tag{i}" for i in range(tags)]
+    for i in range(pages):
+        blocks = int(code) + (rng.random() < code - int(code))
+        path = os.path.join(rng.choice(dirs), f"page-{i}.md")
+        with open(path, "w") as f:
+            f.write(page_text(rng, i, categories, vocabulary, blocks))
+
+    template_dir = os.path.join(root, "templates")
+    os.makedirs(template_dir, exist_ok=True)
+    for name, text in TEMPLATES[templates].items():
+        with open(os.path.join(template_dir, name), "w") as f:
+            f.write(text)
+
+    settings = {
+        "content": content,
+        "templates": template_dir,
+        "site": os.path.join(root, "site"),
+        "categories": {f"cat{i}": f"item{i}" for i in range(categories)} or None,
+    }
+
+    with open(os.path.join(root, "config.yaml"), "w") as f:
+        yaml.safe_dump(settings, f)
+
+    return settings
+
+
+def add_arguments(parser):
+    """Add site shape arguments to a parser."""
+
+    parser.add_argument("--pages", type=int, default=1000, help="Number of pages.")
+    parser.add_argument("--depth", type=int, default=2, help="Section nesting depth.")
+    parser.add_argument("--width", type=int, default=3, help="Subsections per section.")
+    parser.add_argument(
+        "--categories", type=int, default=1, help="Categories per page."
+    )
+    parser.add_argument("--tags", type=int, default=50, help="Items per category.")
+    parser.add_argument("--code", type=float, default=0.2, help="Code blocks per page.")
+    parser.add_argument(
+        "--templates", choices=sorted(TEMPLATES), default="medium", help="Template set."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+
+
+def shape(args):
+    """Return generator keyword arguments from parsed arguments."""
+
+    keys = [
+        "pages",
+        "depth",
+        "width",
+        "categories",
+        "tags",
+        "code",
+        "templates",
+        "seed",
+    ]
+    return {key: getattr(args, key) for key in keys}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", help="Directory to generate the site in.")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    generate(args.root, **shape(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""CLI import time report.
+
+Imports `litesite.cli` in a fresh interpreter with `-X importtime` and
+prints the total import time and the slowest imports.
+
+    $ python -m benchmarks.imports [--top N] [--module litesite.cli]
+
+"""
+
+import argparse
+import subprocess
+import sys
+
+
+def import_times(module):
+    """Return (cumulative microseconds, name) for every import of `module`."""
+
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    times = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        times.append((int(cumulative), name.strip()))
+
+    return times
+
+
+def total(module, runs=3):
+    """Return the best of `runs` total import times in milliseconds."""
+
+    best = None
+    for _ in range(runs):
+        times = dict((name, us) for us, name in import_times(module))
+        ms = times[module] / 1000
+        best = ms if best is None else min(best, ms)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="litesite.cli", help="Module to import.")
+    parser.add_argument("--top", type=int, default=20, help="Slowest imports to list.")
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+    for us, name in sorted(times, reverse=True)[: args.top]:
+        print(f"{us / 1000:>8.1f} ms  {name}")
+
+    print(f"total: {total(args.module):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
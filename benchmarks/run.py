@@ -0,0 +1,164 @@
+"""Build benchmark for synthetic sites.
+
+Generates a synthetic site, then times each build phase separately and
+reports throughput and peak memory. Results can be written as JSON and
+compared against a previous run.
+
+    $ python -m benchmarks.run [--pages N] [--output results.json]
+    $ python -m benchmarks.run --compare old.json
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.generate import add_arguments, generate, shape
+from litesite.builder import (
+    load_bodies,
+    load_categories,
+    load_content,
+    render_site,
+    sort_sections,
+)
+from litesite.content import Site
+
+
+def commit():
+    """Return the current git commit, or None outside a repository."""
+
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return out.stdout.strip()
+
+
+def max_rss():
+    """Return the peak resident set size of this process in megabytes."""
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+class Phases:
+    """Time and measure a sequence of build phases."""
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.results = {}
+
+    def run(self, name, count, func, *args):
+        if self.trace:
+            tracemalloc.start()
+
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - start
+
+        phase = {
+            "seconds": round(seconds, 4),
+            "count": count,
+            "per_second": round(count / seconds, 1) if seconds else None,
+        }
+
+        if self.trace:
+            phase["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            tracemalloc.stop()
+
+        self.results[name] = phase
+        return result
+
+
+def benchmark(settings, trace=False):
+    """Build and render a site, returning per phase results."""
+
+    phases = Phases(trace)
+    pages = sum(len(files) for _, _, files in os.walk(settings["content"]))
+
+    site = Site(settings)
+    site.top = phases.run("load_content", pages, load_content, settings)
+    site.categories = phases.run("load_categories", pages, load_categories, site)
+    phases.run("sort_sections", pages, sort_sections, site)
+    phases.run("load_bodies", pages, load_bodies, site)
+
+    outputs = pages + sum(1 + len(c.items) for c in site.categories)
+    phases.run("render_site", outputs, render_site, site)
+
+    return phases.results
+
+
+def report(results, baseline=None):
+    """Print a results table, with ratios against a baseline run."""
+
+    print(f"{'phase':<16} {'seconds':>10} {'per second':>12} {'peak MB':>9}", end="")
+    print(f" {'vs base':>8}" if baseline else "")
+
+    for name, phase in results["phases"].items():
+        peak = phase.get("peak_mb", "")
+        line = f"{name:<16} {phase['seconds']:>10.4f} {phase['per_second'] or 0:>12.1f} {peak:>9}"
+        if baseline and name in baseline["phases"]:
+            base = baseline["phases"][name]["seconds"]
+            line += f" {phase['seconds'] / base:>7.2f}x" if base else ""
+        print(line)
+
+    print(f"max rss: {results['max_rss_mb']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--workers", type=int, help="Worker processes.")
+    parser.add_argument("--stream", action="store_true", help="Use a streaming build.")
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Measure peak Python memory per phase with tracemalloc (slower).",
+    )
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    parser.add_argument("--compare", help="Previous results JSON to compare against.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        settings = generate(root, **shape(args))
+        settings.update(progress="quiet", workers=args.workers, stream=args.stream)
+        phases = benchmark(settings, args.trace_memory)
+
+    results = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "shape": shape(args),
+        "settings": {"workers": args.workers, "stream": args.stream},
+        "phases": phases,
+        "max_rss_mb": round(max_rss(), 1),
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
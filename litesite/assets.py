@@ -0,0 +1,152 @@
+"""Static asset mirroring.
+
+Files in the `static` directory are mirrored into the site directory
+before rendering. Assets whose size and modification time match the
+mirrored copy, or which are already hard linked to it, are not copied
+again. With `static_link: true` assets are hard linked instead of
+copied where the filesystem allows it.
+
+With `fingerprint` set, CSS and JS files (or the extensions listed in
+the setting) are written with a content hash in their name, e.g.
+`css/style.3f2a1b4c.css`. The mapping from asset path to output path
+is written to `assets.json` in the site directory and is used by the
+`asset` template filter. Outputs of assets which no longer exist are
+removed on the next build.
+
+"""
+
+import json
+import os
+import shutil
+
+from litesite.manifest import digest
+from litesite.stats import stats
+
+MANIFEST = "assets.json"
+FINGERPRINT_EXTENSIONS = [".css", ".js"]
+
+
+def fingerprint_extensions(setting):
+    """Return the extensions selected by the `fingerprint` setting."""
+
+    if not setting:
+        return set()
+
+    if setting is True:
+        return set(FINGERPRINT_EXTENSIONS)
+
+    return set(setting)
+
+
+def fingerprinted(rel, path):
+    """Return the output path of an asset with its content hash."""
+
+    with open(path, "rb") as f:
+        sha = digest(f.read())[:8]
+
+    base, ext = os.path.splitext(rel)
+    return f"{base}.{sha}{ext}"
+
+
+def unchanged(src, dst):
+    """Return True if `dst` is already a copy or link of `src`."""
+
+    try:
+        a, b = os.stat(src), os.stat(dst)
+    except OSError:
+        return False
+
+    if (a.st_dev, a.st_ino) == (b.st_dev, b.st_ino):
+        return True
+
+    return a.st_size == b.st_size and a.st_mtime_ns == b.st_mtime_ns
+
+
+def mirror(src, dst, link=False):
+    """Copy or link `src` to `dst` if it changed. Returns True if written."""
+
+    if unchanged(src, dst):
+        return False
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f"{dst}.{os.getpid()}.tmp"
+
+    try:
+        if link:
+            try:
+                os.link(src, tmp)
+            except OSError:
+                shutil.copy2(src, tmp)
+        else:
+            shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    return True
+
+
+def load_manifest(dest):
+    """Return the asset mapping written by the last build."""
+
+    try:
+        with open(os.path.join(dest, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def copy_assets(settings):
+    """Mirror the static directory into the site directory.
+
+    Returns the asset mapping from path in the static directory to
+    path in the site directory, and the number of files written.
+
+    """
+
+    static = settings.get("static")
+    if not static or not os.path.isdir(static):
+        return {}, 0
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    dest = settings["site"]
+    exts = fingerprint_extensions(settings.get("fingerprint"))
+    link = settings.get("static_link", False)
+
+    with stats.timer("assets"):
+        assets = {}
+        for root, dirs, files in os.walk(static):
+            for name in files:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, static).replace(os.sep, "/")
+
+                if os.path.splitext(name)[1] in exts:
+                    assets[rel] = fingerprinted(rel, path)
+                else:
+                    assets[rel] = rel
+
+        def copy(rel):
+            src = os.path.join(static, rel)
+            return mirror(src, os.path.join(dest, assets[rel]), link)
+
+        workers = settings.get("workers") or os.cpu_count() or 1
+        with ThreadPoolExecutor(workers) as executor:
+            written = sum(executor.map(copy, sorted(assets)))
+
+        outputs = set(assets.values())
+        for old in load_manifest(dest).values():
+            if old in outputs:
+                continue
+
+            for path in (old, old + ".gz", old + ".br"):
+                if os.path.exists(os.path.join(dest, path)):
+                    os.remove(os.path.join(dest, path))
+
+        os.makedirs(dest, exist_ok=True)
+        with open(os.path.join(dest, MANIFEST), "w") as f:
+            json.dump(assets, f, indent=2, sort_keys=True)
+
+    return assets, written
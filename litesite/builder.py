@@ -6,70 +6,460 @@ structures. Render is template lookup and writing content to html.
 
 """
 
+import functools
 import os
-
-from litesite.content import Category, CategoryItem, Page, Section, Site
-from litesite.readers import Reader
+import sys
+import time
+from collections import namedtuple
+
+from litesite.assets import copy_assets
+from litesite.cache import highlight_cache, markdown_cache
+from litesite.compress import compress_site, formats
+from litesite.content import (
+    Category,
+    CategoryItem,
+    Page,
+    Section,
+    Site,
+    page_size,
+    paginators,
+)
+from litesite.feeds import feed_outputs
+from litesite.images import process_images
+from litesite.manifest import digest
+from litesite.progress import Progress
+from litesite.readers import ContentLoader, Reader, read_front_matter, read_metadata
 from litesite.renderers import Renderer
+from litesite.search import write_search
+from litesite.shards import assign, job_cost, output_cost, parse_shard, write_manifest
+from litesite.snapshot import load_snapshot
+from litesite.stats import stats
+from litesite.writers import Writer
+
+## A single output of the render step
+Job = namedtuple("Job", ["name", "url", "obj", "args"])
+
+
+def build_site(settings, manifest=None):
+    """Initialize site and load content into data structures.
+
+    The site graph is built from page metadata first, then page content
+    is converted. If a `manifest` from a previous build is passed,
+    unchanged content files are loaded from it instead of being
+    converted again. If `snapshot` is set, the site is loaded from that
+    snapshot file instead.
+
+    """
+
+    if settings.get("snapshot"):
+        return load_snapshot(settings["snapshot"], settings, manifest)
+
+    site = scan_site(settings, manifest)
+
+    with stats.timer("load_bodies"):
+        load_bodies(site, manifest)
+
+    return site
+
 
+def scan_site(settings, manifest=None):
+    """Build the site graph from page metadata alone.
 
-def build_site(settings):
-    """Initialize site and load content into data structures."""
+    Sections, pages, categories, and page order are all available, but
+    page content has not been converted.
+
+    """
 
     site = Site(settings)
-    site.top = load_content(settings)
-    site.categories = load_categories(site)
+
+    with stats.timer("load_content"):
+        site.top = load_content(settings, manifest)
+
+    with stats.timer("load_categories"):
+        site.categories = load_categories(site)
+
+    with stats.timer("sort_sections"):
+        sort_sections(site)
 
     return site
 
 
-def render_site(site):
-    """Renders every content object in the site."""
+def sort_sections(site):
+    """Precompute the page order of every section.
 
-    renderer = Renderer(site.settings)
-    dest = site.settings["site"]
-    os.makedirs(dest, exist_ok=True)
+    Sections with pages missing a date or title can't be sorted, they
+    are left to raise if their order is used during rendering.
+
+    """
+
+    for section in site.sections:
+        section.invalidate()
+        try:
+            section.sorted
+        except (KeyError, TypeError):
+            pass
+
+
+def render_jobs(site):
+    """Yield a render job for every content object in the site.
+
+    Section index pages, categories, and category items named in the
+    `paginate` setting yield one job per page of their listing.
+
+    """
+
+    settings = site.settings
 
     for page in site.pages:
-        print(page.name)
-        out = os.path.join(dest, page.url)
-        args = {"page": page, "site": site, "settings": site.settings}
-        renderer.render(out, page.templates, args)
+        args = {"page": page, "site": site, "settings": settings}
+        section = page.section
+        per_page = (
+            page_size(settings, "section", section.name) if page.is_index else None
+        )
+        yield from paginated(Job(page.name, page.url, page, args), section, per_page)
 
     for category in site.categories:
-        print(category.name)
-        out = os.path.join(dest, category.url)
-        args = {
-            "category": category,
-            "site": site,
-            "settings": site.settings,
-        }
-        renderer.render(out, category.templates, args)
+        args = {"category": category, "site": site, "settings": settings}
+        job = Job(category.name, category.url, category, args)
+        yield from paginated(
+            job, category, page_size(settings, "category", category.name)
+        )
 
+        per_page = page_size(settings, "item", category.item_name)
         for item in category.items:
-            print(item.value)
-            out = os.path.join(dest, item.url)
-            args = {"item": item, "site": site, "settings": site.settings}
-            renderer.render(out, item.templates, args)
+            args = {"item": item, "site": site, "settings": settings}
+            yield from paginated(Job(item.value, item.url, item, args), item, per_page)
+
+
+def paginated(job, obj, per_page):
+    """Yield a job per page of the listing of `obj`, or `job` unchanged."""
+
+    if not per_page:
+        yield job
+        return
+
+    for paginator in paginators(obj, job.url, per_page):
+        number = paginator.number
+        name = f"{job.name} {number}" if number > 1 else job.name
+        args = dict(job.args, paginator=paginator)
+
+        yield Job(name, paginator.url, job.obj, args)
+
+
+def render_site(site, manifest=None):
+    """Renders every content object in the site.
+
+    If a `manifest` is passed, outputs whose dependencies are unchanged
+    since the last build are skipped and outputs that are no longer
+    produced are removed. Files in the `static` directory are mirrored
+    into the site first, along with image derivatives if `images` is
+    set. Rendering is split across `workers` processes
+    if set in the settings. Feeds and sitemaps enabled with `feeds` and
+    `sitemap` are written after the templated outputs, followed by the
+    search index if `search` is set. If `compress` is
+    set, compressed siblings of changed text outputs are written last.
+
+    If `shard` is set to `[K, N]`, only the templated outputs and feeds
+    assigned to shard K of N are rendered, and a manifest of them is
+    written. See `litesite.shards`.
+
+    """
+
+    with stats.timer("render_site"):
+        return _render_site(site, manifest)
+
+
+def _render_site(site, manifest):
+    settings = site.settings
+    dest = settings["site"]
+    os.makedirs(dest, exist_ok=True)
+
+    ## Check the setting before rendering rather than after
+    if settings.get("compress"):
+        formats(settings["compress"])
+
+    site.assets, copied = copy_assets(settings)
+    site.images = process_images(settings, site.assets)
+    if manifest:
+        manifest.track_assets(site.assets, site.images)
+        manifest.track_site(site)
+
+    with stats.timer("render_jobs"):
+        all_jobs = list(render_jobs(site))
+
+    with stats.timer("feed_outputs"):
+        all_feeds = list(feed_outputs(site))
+
+    shard = parse_shard(settings["shard"]) if settings.get("shard") else None
+    if shard:
+        with stats.timer("assign_shards"):
+            costs = {job.url: job_cost(job, site.source_sizes) for job in all_jobs}
+            costs.update((output.url, output_cost(output)) for output in all_feeds)
+            shards = assign(costs, shard[1])
+
+        all_jobs = [job for job in all_jobs if shards[job.url] == shard[0]]
+        all_feeds = [output for output in all_feeds if shards[output.url] == shard[0]]
+
+        if manifest:
+            for url, number in shards.items():
+                if number != shard[0]:
+                    manifest.keep(os.path.join(dest, url))
+
+    jobs = []
+    with stats.timer("fresh_jobs"):
+        for job in all_jobs:
+            out = os.path.join(dest, job.url)
+            if manifest and manifest.fresh(out, job.url, job.obj.dependencies):
+                continue
+
+            jobs.append(job)
+
+    feeds = []
+    with stats.timer("fresh_feeds"):
+        for output in all_feeds:
+            out = os.path.join(dest, output.url)
+            if manifest and manifest.fresh(out, output.url, output.dependencies):
+                continue
+
+            feeds.append(output)
+
+    total = len(jobs) + len(feeds)
+    progress = Progress(settings.get("progress"), total)
+    workers = settings.get("workers") or 1
+
+    if workers > 1 and len(jobs) > 1:
+        results = render_parallel(site, jobs, workers)
+    else:
+        init_renderer(site, jobs)
+        results = (render_job(i) for i in range(len(jobs)))
+
+    written = []
+    for name, out, changed in results:
+        progress.update(name)
+        if changed:
+            written.append(out)
+
+    writer = Writer()
+    with stats.timer("write_feeds"):
+        for output in feeds:
+            out = os.path.join(dest, output.url)
+            progress.update(output.name)
+            if writer.write_chunks(out, output.chunks()):
+                written.append(out)
+
+    ## Site wide outputs belong to the first shard
+    indexed = write_search(site, writer, manifest) if not shard or shard[0] == 1 else []
+
+    if manifest:
+        for out in manifest.prune():
+            progress.message(f"removed {out}")
+
+    progress.close()
+    progress.message(f"{len(written)} written, {total - len(written)} unchanged")
+
+    if settings.get("static"):
+        progress.message(f"{copied} assets copied")
+
+    if settings.get("search"):
+        progress.message(f"{len(indexed)} search files written")
+        written += indexed
+
+    if shard:
+        path = write_manifest(settings, shards, *shard)
+        progress.message(f"shard {shard[0]}/{shard[1]} manifest written to {path}")
+
+    if settings.get("compress"):
+        compressed = compress_site(settings)
+        progress.message(f"{compressed} compressed")
+
+    return written
+
+
+def render_parallel(site, jobs, workers):
+    """Render jobs across a pool of workers, yielding results in job order.
+
+    Jobs are split into contiguous chunks, one batch per task. Forked
+    processes are used for template rendering where available so
+    workers share the built site without serializing it, otherwise a
+    thread pool is used. Within a worker, files are written from a
+    thread pool while the next template renders. Each output is written
+    by exactly one worker, so the result is the same as rendering
+    serially.
+
+    """
+
+    chunksize = max(1, len(jobs) // (workers * 4))
+    chunks = [
+        range(i, min(i + chunksize, len(jobs))) for i in range(0, len(jobs), chunksize)
+    ]
+
+    ## Set before forking so every worker inherits the jobs and
+    ## compiled templates, only those the jobs use
+    init_renderer(site, jobs)
+    for templates in {job.obj.templates for job in jobs}:
+        _renderer.lookup(templates)
+
+    import multiprocessing
+    from concurrent.futures import ThreadPoolExecutor
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        executor, task = process_pool(workers, init_worker, (stats.enabled,), context)
+    else:
+        executor, task = ThreadPoolExecutor(workers), lambda fn: fn
+
+    with executor:
+        for results, data in executor.map(task(render_chunk), chunks):
+            if data:
+                stats.merge(data)
+            yield from results
+
+
+def process_pool(workers, initializer, initargs, context=None):
+    """Return a process pool whose workers run `initializer` first.
+
+    Also returns a function wrapping the tasks submitted to the pool.
+    Python 3.6 executors take no initializer or start method, so there
+    the default start method is used, and the wrapped tasks run the
+    initializer before the first task in each worker instead.
+
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    if sys.version_info >= (3, 7):
+        executor = ProcessPoolExecutor(
+            workers, mp_context=context, initializer=initializer, initargs=initargs
+        )
+        return executor, lambda fn: fn
+
+    def wrap(fn):
+        return functools.partial(initialized, initializer, initargs, fn)
+
+    return ProcessPoolExecutor(workers), wrap
+
+
+## Process the `initialized` task wrapper last ran an initializer in
+_initialized = None
+
+
+def initialized(initializer, initargs, fn, *args):
+    """Call `fn`, running `initializer` first if this process hasn't yet."""
+
+    global _initialized
+    if _initialized != os.getpid():
+        initializer(*initargs)
+        _initialized = os.getpid()
+
+    return fn(*args)
+
+
+## Jobs and renderer used by `render_job`, one renderer per process
+_jobs = []
+_renderer = None
+_parent = None
+
+
+def init_renderer(site, jobs):
+    """Set the jobs and create a renderer for the current process."""
+
+    global _jobs, _renderer, _parent
+    _jobs = jobs
+    _renderer = Renderer(site.settings)
+    _parent = os.getpid()
+
+
+def render_job(index):
+    """Render a job by index.
+
+    Returns the job name, the output path, and whether the output file
+    changed.
+
+    """
+
+    job = _jobs[index]
+    out = os.path.join(job.args["settings"]["site"], job.url)
+
+    start = time.perf_counter()
+    text = _renderer.render_text(job.obj.templates, job.args)
+    changed = _renderer.write(out, text)
+    release(job)
+
+    if stats.enabled:
+        stats.page(job.url, time.perf_counter() - start)
+
+    return job.name, out, changed
+
+
+def release(job):
+    """Drop content loaded on demand for a rendered page."""
 
+    if isinstance(job.obj, Page):
+        job.obj.release()
 
-def load_content(settings):
+
+def render_chunk(indices):
+    """Render a batch of jobs, writing files from a thread pool.
+
+    Returns a `render_job` style result per job, and stats recorded if
+    running in a worker process.
+
+    """
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    names = []
+    outs = []
+    with ThreadPoolExecutor(2) as writer:
+        writes = []
+        for i in indices:
+            job = _jobs[i]
+            out = os.path.join(job.args["settings"]["site"], job.url)
+
+            start = time.perf_counter()
+            text = _renderer.render_text(job.obj.templates, job.args)
+            release(job)
+
+            if stats.enabled:
+                stats.page(job.url, time.perf_counter() - start)
+
+            writes.append(writer.submit(_renderer.write, out, text))
+            names.append(job.name)
+            outs.append(out)
+
+        changed = [write.result() for write in writes]
+
+    in_worker = stats.enabled and os.getpid() != _parent
+    return list(zip(names, outs, changed)), stats.drain() if in_worker else None
+
+
+def load_content(settings, manifest=None):
     """Load section and page data from the content directory.
 
     os.walk is used to traverse the content directory and populate
-    section data.
+    section data. Only the metadata block of each content file is read,
+    page content is left to `load_bodies`.
 
     """
 
-    exts = settings.get("markdown_extensions")
-    reader = Reader(user_extensions=exts)
     queue = []
+    loader = content_loader(settings)
 
     for path, dirs, files in os.walk(settings["content"]):
         parent = queue.pop() if queue else None
-        section = build_section(path, parent, files, settings, reader)
+        section = build_section(path, parent, settings)
         queue += [section for _ in dirs]
 
+        for _file in files:
+            source = os.path.join(path, _file)
+
+            if manifest and manifest.lookup(source):
+                _, metadata = manifest.get(source)
+            else:
+                metadata = read_front_matter(source)
+
+            add_page(section, source, None, metadata, loader)
+
         if parent:
             parent.subsections.append(section)
         else:
@@ -78,8 +468,52 @@ def load_content(settings):
     return top
 
 
-def build_section(path, parent, files, settings, reader):
-    """Load a section and child pages."""
+def load_bodies(site, manifest=None):
+    """Convert the content of every page in the site.
+
+    Content files are read in parallel if `workers` is set in the
+    settings. Metadata was already read by `load_content`, so only the
+    document bodies are converted, and files it found unchanged in the
+    `manifest` are not looked up again. If `stream` is set content is
+    converted on demand instead, and files are only read here to
+    record their hash in the `manifest`.
+
+    """
+
+    settings = site.settings
+    if settings.get("stream") and not manifest:
+        return
+
+    pages = list(site.pages)
+    if manifest:
+        for page in pages:
+            entry = manifest.files.get(page.source)
+            if entry:
+                page.content = entry["content"]
+
+        pages = [page for page in pages if page.source not in manifest.files]
+
+    sources = [page.source for page in pages]
+    metadata = [page.metadata for page in pages]
+    results = read_sources(sources, settings, manifest, metadata)
+
+    for page, (text, _) in zip(pages, results):
+        page.content = text
+
+
+def content_loader(settings):
+    """Return a loader for on demand content in streaming builds."""
+
+    if not settings.get("stream"):
+        return None
+
+    exts = settings.get("markdown_extensions")
+    reader = Reader(exts, markdown_cache(settings), highlight_cache(settings))
+    return ContentLoader(reader, settings.get("stream_cache") or 256)
+
+
+def build_section(path, parent, settings):
+    """Create a section for a content directory."""
 
     rel = os.path.relpath(path, settings["content"])
 
@@ -95,45 +529,208 @@ def build_section(path, parent, files, settings, reader):
     else:
         override = None
 
-    section = Section(name, rel, parent, override)
+    return Section(name, rel, parent, override)
 
-    for _file in files:
-        name = os.path.basename(os.path.splitext(_file)[0])
-        with open(os.path.join(path, _file), "r") as f:
-            text, metadata = reader.read(f.read())
 
-        page = Page(name, text, metadata, section)
+def add_page(section, source, text, metadata, loader=None):
+    """Create a page from a content file and add it to a section."""
 
-        if page.is_index:
-            section.index = page
-        else:
-            section.pages.append(page)
+    name = os.path.basename(os.path.splitext(source)[0])
+    page = Page(name, text, metadata, section, source, loader)
+
+    if page.is_index:
+        section.index = page
+    else:
+        section.pages.append(page)
+
+    return page
+
+
+def replace_page(old, text, metadata):
+    """Replace a page with one read from new text and metadata."""
+
+    section = old.section
+    page = Page(old.name, text, metadata, section, old.source, old.loader)
+    page.release()
+
+    if page.is_index:
+        section.index = page
+    else:
+        section.pages[section.pages.index(old)] = page
+        section.invalidate()
+
+    return page
+
+
+def read_sources(sources, settings, manifest=None, metadata=None):
+    """Return converted text and metadata for each source, in order.
+
+    Sources unchanged since the last build are taken from the
+    `manifest`. If the `metadata` of each source is passed, it was
+    already read along with the manifest lookup, so every source is
+    read and only its document body is converted. The rest are
+    converted serially, or across a process
+    pool with one reader per worker if `workers` is greater than one,
+    going through the converted markdown and highlighted code caches if
+    they are enabled. When
+    streaming, only metadata is read and the returned text is None.
+
+    """
 
-    return section
+    exts = settings.get("markdown_extensions")
+    cache = markdown_cache(settings)
+    highlights = highlight_cache(settings)
+    workers = settings.get("workers") or 1
+    if metadata is not None:
+        read = read_source_digest if settings.get("stream") else read_source_body
+    else:
+        read = read_source_metadata if settings.get("stream") else read_source
+
+    if manifest and metadata is None:
+        pending = [source for source in sources if not manifest.lookup(source)]
+    else:
+        pending = sources
+
+    if workers > 1 and len(pending) > 1:
+        size = max(1, len(pending) // (workers * 4))
+        batches = [pending[i : i + size] for i in range(0, len(pending), size)]
+        initargs = (exts, cache, highlights, stats.enabled)
+
+        converted = []
+        ex, task = process_pool(workers, init_read_worker, initargs)
+        with ex:
+            batch = task(read_batch)
+            for results, data in ex.map(batch, [read] * len(batches), batches):
+                converted += results
+                if data:
+                    stats.merge(data)
+    else:
+        init_reader(exts, cache, highlights)
+        converted = [read(source) for source in pending]
+
+    if metadata is not None:
+        converted = [
+            (sha, content, meta) for (sha, content, _), meta in zip(converted, metadata)
+        ]
+
+    if not manifest:
+        return [(content, metadata) for _, content, metadata in converted]
+
+    for source, result in zip(pending, converted):
+        manifest.store(source, *result)
+
+    return [manifest.get(source) for source in sources]
+
+
+## Reader used by `read_source`, one per process
+_reader = None
+
+
+def init_reader(exts, cache=None, highlights=None):
+    """Initialize the reader for the current process."""
+
+    global _reader
+    _reader = Reader(user_extensions=exts, cache=cache, highlight_cache=highlights)
+
+
+def init_read_worker(exts, cache, highlights, record_stats):
+    """Initialize a reader worker process."""
+
+    init_worker(record_stats)
+    init_reader(exts, cache, highlights)
+
+
+def init_worker(record_stats):
+    """Start worker stats empty, rather than with a copy of the parent's."""
+
+    stats.reset()
+
+    if record_stats and not stats.enabled:
+        stats.enable()
+
+
+def read_batch(read, sources):
+    """Read a batch of sources in a worker, returning results and stats."""
+
+    results = [read(source) for source in sources]
+    return results, stats.drain() if stats.enabled else None
+
+
+def read_source(source):
+    """Read and convert a content file with the process reader."""
+
+    with open(source, "r") as f:
+        text = f.read()
+
+    content, metadata = _reader.read(text)
+    return digest(text), content, metadata
+
+
+def read_source_body(source):
+    """Read a content file and convert only its document body."""
+
+    with open(source, "r") as f:
+        text = f.read()
+
+    return digest(text), _reader.read_body(text), None
+
+
+def read_source_digest(source):
+    """Read only the hash of a content file."""
+
+    with open(source, "r") as f:
+        text = f.read()
+
+    return digest(text), None, None
+
+
+def read_source_metadata(source):
+    """Read only the metadata of a content file."""
+
+    with open(source, "r") as f:
+        text = f.read()
+
+    return digest(text), None, read_metadata(text)
 
 
 def load_categories(site):
-    """Populate categories from config definition"""
+    """Populate categories from config definition.
+
+    Categories are built in a single pass over the site pages, indexing
+    each page under every category item in its metadata.
+
+    """
 
     cats = site.settings["categories"]
-    pages = site.pages
     categories = []
 
     if not cats:
         return categories
 
+    index = {}
     for name, item_name in cats.items():
-        category = Category(name, item_name)
-        for page in pages:
-            if page.metadata.get(name):
-                category.pages.append(page)
+        categories.append(Category(name, item_name))
+        index[name] = {}
+
+    for page in site.pages:
+        for category in categories:
+            vals = page.metadata.get(category.name)
+            if not vals:
+                continue
+
+            category.pages.append(page)
+            items = index[category.name]
+
+            for val in vals:
+                item = items.get(val)
+                if item is None:
+                    item = items[val] = CategoryItem(category, val)
 
-        vals = set()
-        for page in category.pages:
-            for val in page.metadata.get(name):
-                vals.add(val)
+                ## A value listed twice on a page only counts once
+                if not item.pages or item.pages[-1] is not page:
+                    item.pages.append(page)
 
-        category.items = [CategoryItem(category, val) for val in vals]
-        categories.append(category)
+    for category in categories:
+        category.items = list(index[category.name].values())
 
     return categories
@@ -0,0 +1,156 @@
+"""Persistent on-disk caches.
+
+Cached values are pickled into one file per key under the build cache
+directory. Each cache has a size limit, and the least recently used
+entries are evicted once it is exceeded.
+
+"""
+
+import os
+import pickle
+import shutil
+
+from litesite.manifest import cache_dir
+
+## Default cache size limit in megabytes
+DEFAULT_SIZE = 512
+
+## Cache directories under the build cache directory: converted
+## markdown, highlighted code blocks, template bytecode, and image
+## derivatives
+CACHES = ["markdown", "highlight", "templates", "images"]
+
+
+class Cache:
+    """Size-limited key-value store backed by a directory.
+
+    Entry modification times are updated on every hit, so eviction
+    removes the least recently used entries first. Writes go through a
+    temporary file and rename, so caches can be shared between worker
+    processes.
+
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_SIZE):
+        self.directory = directory
+        self.max_size = max_size * 1024 * 1024
+        self.size = None
+
+    def path(self, key):
+        """Return the file path for a key."""
+
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key, default=None):
+        """Return the value for a key, or `default` if it is not cached."""
+
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return value
+
+    def set(self, key, value):
+        """Store a value, evicting old entries if the cache is full."""
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self.entries())
+        else:
+            self.size += os.path.getsize(path)
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def entries(self):
+        """Yield a (path, size, mtime) tuple for every cache entry."""
+
+        if not os.path.isdir(self.directory):
+            return
+
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                yield path, stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """Remove least recently used entries until under half the limit.
+
+        Evicting down to half the limit keeps eviction, which has to
+        scan the whole cache, from running on every write.
+
+        """
+
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        size = sum(entry[1] for entry in entries)
+
+        for path, entry_size, _ in entries:
+            if size <= self.max_size // 2:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+            size -= entry_size
+
+        self.size = size
+
+    def clear(self):
+        """Remove every entry from the cache."""
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.size = 0
+
+
+def markdown_cache(settings):
+    """Return the converted markdown cache, or None if it is disabled."""
+
+    if not settings.get("cache"):
+        return None
+
+    directory = os.path.join(cache_dir(settings), "markdown")
+    return Cache(directory, settings.get("cache_size") or DEFAULT_SIZE)
+
+
+def highlight_cache(settings):
+    """Return the highlighted code block cache, or None if it is disabled."""
+
+    if not settings.get("cache"):
+        return None
+
+    directory = os.path.join(cache_dir(settings), "highlight")
+    return Cache(directory, settings.get("cache_size") or DEFAULT_SIZE)
+
+
+def clear_caches(settings):
+    """Empty every cache in the build cache directory.
+
+    The incremental build manifest and search index are build state
+    rather than caches, and are kept.
+
+    """
+
+    for name in CACHES:
+        Cache(os.path.join(cache_dir(settings), name)).clear()
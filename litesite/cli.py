@@ -1,11 +1,115 @@
-"""Command line entry points."""
+"""Command line entry points.
+
+The default command builds the site from a config file. Other commands
+are selected by name as the first argument, e.g. `litesite serve
+config.yaml`.
+
+"""
 
 import argparse
+import cProfile
+import json
 import sys
 
 import yaml
 
-from litesite.builder import build_site, render_site
+from litesite import graph
+from litesite.builder import build_site, render_site, scan_site
+from litesite.cache import clear_caches
+from litesite.manifest import Manifest
+from litesite.renderers import Renderer
+from litesite.shards import check_manifests, parse_shard
+from litesite.snapshot import write_snapshot
+from litesite.stats import stats
+
+
+def shard_argument(value):
+    """Parse a `K/N` shard argument."""
+
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def add_build_arguments(parser):
+    """Add the config file and build options to a parser."""
+
+    parser.add_argument(
+        "config", type=argparse.FileType("r"), help="Configuration YAML file location."
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only convert and render content changed since the last build.",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Number of worker processes used to convert and render content.",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read page metadata first and convert content only when rendered.",
+    )
+
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Write gzip (and brotli, if installed) siblings of text outputs.",
+    )
+
+    parser.add_argument(
+        "--shard",
+        type=shard_argument,
+        metavar="K/N",
+        help="Render only the outputs assigned to shard K of N.",
+    )
+
+    parser.add_argument(
+        "--snapshot",
+        metavar="FILE",
+        help="Load the site from a snapshot written by `litesite snapshot`.",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not use the converted markdown cache.",
+    )
+
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Empty the markdown, highlight, template, and image caches before building.",
+    )
+
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print time and call counts per phase, template, and slowest output.",
+    )
+
+    parser.add_argument(
+        "--stats-json", metavar="FILE", help="Write build stats as JSON to FILE."
+    )
+
+    parser.add_argument(
+        "--profile", metavar="FILE", help="Write a cProfile dump of the build to FILE."
+    )
+
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument(
+        "-q", "--quiet", action="store_true", help="Do not report rendered objects."
+    )
+    output.add_argument(
+        "--progress", action="store_true", help="Show a progress bar while rendering."
+    )
 
 
 def parse_args(args):
@@ -15,20 +119,256 @@ def parse_args(args):
         description="Litesite is a little static site generator."
     )
 
+    add_build_arguments(parser)
+
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and rebuild when content or templates change.",
+    )
+
+    return parser.parse_args(args)
+
+
+def parse_serve_args(args):
+    """Argument parser for the serve command."""
+
+    parser = argparse.ArgumentParser(
+        prog="litesite serve",
+        description="Serve the site locally, rebuilding and reloading on change.",
+    )
+
+    add_build_arguments(parser)
+
+    parser.add_argument("--host", default="localhost", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+
+    return parser.parse_args(args)
+
+
+def parse_index_args(args):
+    """Argument parser for the index command."""
+
+    parser = argparse.ArgumentParser(
+        prog="litesite index",
+        description="Write the site graph as JSON, reading only page metadata.",
+    )
+
     parser.add_argument(
         "config", type=argparse.FileType("r"), help="Configuration YAML file location."
     )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Output file, standard output by default.",
+    )
+    parser.add_argument("--indent", type=int, help="JSON indentation level.")
 
     return parser.parse_args(args)
 
 
-def main():
-    """Load YAML settings, then build and render the site."""
+def parse_precompile_args(args):
+    """Argument parser for the precompile command."""
+
+    parser = argparse.ArgumentParser(
+        prog="litesite precompile",
+        description="Compile every template into the template bytecode cache.",
+    )
+
+    parser.add_argument(
+        "config", type=argparse.FileType("r"), help="Configuration YAML file location."
+    )
+
+    return parser.parse_args(args)
 
-    parser = parse_args(sys.argv[1:])
+
+def parse_snapshot_args(args):
+    """Argument parser for the snapshot command."""
+
+    parser = argparse.ArgumentParser(
+        prog="litesite snapshot",
+        description="Build the site graph and content and write it to a snapshot file.",
+    )
+
+    parser.add_argument(
+        "config", type=argparse.FileType("r"), help="Configuration YAML file location."
+    )
+    parser.add_argument("-o", "--output", required=True, help="Snapshot file to write.")
+
+    return parser.parse_args(args)
+
+
+def parse_merge_args(args):
+    """Argument parser for the merge command."""
+
+    parser = argparse.ArgumentParser(
+        prog="litesite merge",
+        description="Check that shard manifests cover every output exactly once.",
+    )
+
+    parser.add_argument(
+        "manifests",
+        nargs="+",
+        type=argparse.FileType("r"),
+        help="Shard manifests written by `litesite --shard K/N`.",
+    )
+
+    return parser.parse_args(args)
+
+
+def load_settings(parser):
+    """Load YAML settings and apply command line overrides."""
+
+    settings = yaml.load(parser.config, Loader=yaml.SafeLoader)
+
+    if parser.incremental:
+        settings["incremental"] = True
+
+    if parser.jobs:
+        settings["workers"] = parser.jobs
+
+    if parser.stream:
+        settings["stream"] = True
+
+    if parser.compress:
+        settings["compress"] = True
+
+    if parser.shard:
+        settings["shard"] = list(parser.shard)
+
+    if parser.snapshot:
+        settings["snapshot"] = parser.snapshot
+
+    if parser.quiet:
+        settings["progress"] = "quiet"
+    elif parser.progress:
+        settings["progress"] = "bar"
+
+    if parser.no_cache:
+        settings["cache"] = False
+    else:
+        settings.setdefault("cache", True)
+
+    if parser.clear_cache:
+        clear_caches(settings)
+
+    return settings
+
+
+def build_command(args):
+    """Build and render the site."""
+
+    parser = parse_args(args)
+    settings = load_settings(parser)
+
+    if parser.watch:
+        from litesite.server import watch
+
+        watch(settings)
+        return
+
+    if parser.stats or parser.stats_json or parser.profile:
+        stats.enable()
+
+    if parser.profile:
+        profiler = cProfile.Profile()
+        profiler.runcall(build, settings)
+        profiler.dump_stats(parser.profile)
+    else:
+        build(settings)
+
+    if parser.stats or parser.profile:
+        print(stats.summary())
+
+    if parser.stats_json:
+        stats.dump(parser.stats_json)
+
+
+def build(settings):
+    """Build and render the site, incrementally if configured."""
+
+    manifest = Manifest(settings) if settings.get("incremental") else None
+
+    site = build_site(settings, manifest)
+    render_site(site, manifest)
+
+    if manifest:
+        manifest.save()
+
+
+def serve_command(args):
+    """Serve the site with live reload."""
+
+    from litesite.server import serve
+
+    parser = parse_serve_args(args)
+    serve(load_settings(parser), parser.host, parser.port)
+
+
+def index_command(args):
+    """Write the site graph as JSON."""
+
+    parser = parse_index_args(args)
     settings = yaml.load(parser.config, Loader=yaml.SafeLoader)
-    site = build_site(settings)
-    render_site(site)
+
+    graph.dump(scan_site(settings), parser.output, indent=parser.indent)
+
+
+def precompile_command(args):
+    """Compile every template into the bytecode cache."""
+
+    parser = parse_precompile_args(args)
+    settings = yaml.load(parser.config, Loader=yaml.SafeLoader)
+    settings.setdefault("cache", True)
+
+    for name in Renderer(settings).precompile():
+        print(name)
+
+
+def snapshot_command(args):
+    """Write a snapshot of the built site."""
+
+    parser = parse_snapshot_args(args)
+    settings = yaml.load(parser.config, Loader=yaml.SafeLoader)
+    settings.setdefault("cache", True)
+
+    site = write_snapshot(settings, parser.output)
+    print(f"{len(list(site.pages))} pages written to {parser.output}")
+
+
+def merge_command(args):
+    """Check shard manifests, exiting with an error if incomplete."""
+
+    parser = parse_merge_args(args)
+    manifests = [json.load(f) for f in parser.manifests]
+
+    errors = check_manifests(manifests)
+    if errors:
+        sys.exit("\n".join(errors))
+
+    print(f"{manifests[0]['total']} outputs in {len(manifests)} shards")
+
+
+commands = {
+    "index": index_command,
+    "merge": merge_command,
+    "precompile": precompile_command,
+    "serve": serve_command,
+    "snapshot": snapshot_command,
+}
+
+
+def main():
+    """Run a named command, or build the site by default."""
+
+    args = sys.argv[1:]
+
+    if args and args[0] in commands:
+        commands[args[0]](args[1:])
+    else:
+        build_command(args)
 
 
 if __name__ == """__main__""":
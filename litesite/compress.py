@@ -0,0 +1,140 @@
+"""Pre-compressed output generation.
+
+Writes `.gz` and, if the `brotli` package is installed, `.br` siblings
+for text outputs, for servers that serve pre-compressed files such as
+nginx with `gzip_static`. Compressed siblings take the modification
+time of their source, so a file is only compressed again after its
+content changes.
+
+"""
+
+import gzip
+import io
+import os
+
+from litesite.stats import stats
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+## Output extensions to compress, litesite page URLs have no extension
+EXTENSIONS = {"", ".html", ".xml", ".css", ".js", ".json"}
+
+
+def gzip_compress(data):
+    """Gzip compress data with a fixed timestamp, for reproducible output."""
+
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=9, mtime=0) as f:
+        f.write(data)
+
+    return buf.getvalue()
+
+
+def brotli_compress(data):
+    return brotli.compress(data)
+
+
+compressors = {".gz": gzip_compress}
+if brotli:
+    compressors[".br"] = brotli_compress
+
+
+def formats(setting):
+    """Return the sibling extensions selected by the `compress` setting.
+
+    The setting is either true, for every available format, or a format
+    name or list of names. Raises ValueError for any other value or an
+    unknown name. Brotli is skipped if the package isn't installed.
+
+    """
+
+    names = {"gzip": ".gz", "brotli": ".br"}
+
+    if setting is True:
+        return list(compressors)
+
+    if isinstance(setting, str):
+        setting = [setting]
+
+    if not isinstance(setting, (list, tuple)):
+        raise ValueError(
+            f"compress must be true, a format name, or a list of names, "
+            f"got {setting!r}"
+        )
+
+    for name in setting:
+        if name not in names:
+            raise ValueError(
+                f"unknown compress format {name!r}, expected gzip or brotli"
+            )
+
+    return [names[name] for name in setting if names[name] in compressors]
+
+
+def eligible(path):
+    """Return True if an output should be compressed."""
+
+    name = os.path.basename(path)
+    return os.path.splitext(name)[1] in EXTENSIONS and not name.startswith(".")
+
+
+def compress_file(path, exts):
+    """Write compressed siblings of a file if it changed since last time.
+
+    Returns the number of siblings written.
+
+    """
+
+    mtime = os.stat(path).st_mtime_ns
+    stale = []
+    for ext in exts:
+        try:
+            if os.stat(path + ext).st_mtime_ns == mtime:
+                continue
+        except OSError:
+            pass
+        stale.append(ext)
+
+    if not stale:
+        return 0
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    for ext in stale:
+        sibling = path + ext
+        tmp = f"{sibling}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(compressors[ext](data))
+        os.utime(tmp, ns=(mtime, mtime))
+        os.replace(tmp, sibling)
+
+    return len(stale)
+
+
+def compress_site(settings, workers=None):
+    """Compress every eligible output in the site directory.
+
+    Returns the number of siblings written.
+
+    """
+
+    exts = formats(settings["compress"])
+    if not exts:
+        return 0
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    paths = []
+    for root, dirs, files in os.walk(settings["site"]):
+        for name in files:
+            path = os.path.join(root, name)
+            if eligible(path):
+                paths.append(path)
+
+    workers = workers or settings.get("workers") or os.cpu_count() or 1
+    with stats.timer("compress"), ThreadPoolExecutor(workers) as executor:
+        return sum(executor.map(lambda path: compress_file(path, exts), paths))
@@ -1,11 +1,60 @@
-"""Data structures for site content."""
+"""Data structures for site content.
+
+Sections, pages, categories, and category items use `__slots__`, as
+large sites hold hundreds of thousands of them in memory.
+
+"""
 
 import datetime
+import posixpath
+import sys
+
+from litesite.renderers import CATEGORY_URL, ITEM_URL, PAGE_URL, render_url
+from litesite.stats import stats
+
+## Template list shared by every page without a `template` override
+PAGE_TEMPLATES = (None, "page")
+
+## ISO 8601 parser, new in Python 3.7
+fromisoformat = getattr(datetime.datetime, "fromisoformat", None)
 
-from cached_property import cached_property
-from dateutil.parser import parse
 
-from litesite.renderers import Renderer
+def parse_date(value):
+    """Parse a page date string.
+
+    ISO 8601 dates are parsed with `datetime.fromisoformat`, where
+    available, anything else falls back to dateutil. Non string values, such as dates
+    already parsed by YAML, are returned unchanged.
+
+    """
+
+    if not isinstance(value, str):
+        return value
+
+    if fromisoformat and value[:4].isdigit() and value[4:5] == "-":
+        try:
+            return fromisoformat(value)
+        except ValueError:
+            pass
+
+    from dateutil.parser import parse
+
+    return parse(value)
+
+
+def sort_key(page):
+    """Return the precomputed (date, title) sort key of a page.
+
+    Raises KeyError for pages missing a date or title, like indexing
+    the metadata directly would.
+
+    """
+
+    key = page.sort_key
+    if key is None:
+        raise KeyError(f"{page.name} has no date or title")
+
+    return key
 
 
 class Site:
@@ -22,6 +71,11 @@ class Site:
 
         self.top = None
         self.categories = []
+        self.assets = {}
+        self.images = {}
+
+        ## Source file sizes recorded in a snapshot, for shard balancing
+        self.source_sizes = None
 
     @property
     def sections(self):
@@ -50,6 +104,18 @@ class Section:
 
     """
 
+    __slots__ = (
+        "name",
+        "parent",
+        "rel",
+        "override",
+        "index",
+        "subsections",
+        "pages",
+        "_sorted",
+        "_positions",
+    )
+
     def __init__(self, name, rel, parent, override):
         self.name = name
         self.parent = parent
@@ -60,13 +126,40 @@ class Section:
         self.subsections = []
         self.pages = []
 
+        self._sorted = None
+        self._positions = None
+
     @property
     def sorted(self):
-        """Return non-index pages sorted in date, title order."""
+        """Return non-index pages sorted in date, title order.
+
+        The order is computed once and cached along with the position
+        of each page. The cache is recomputed when the number of pages
+        changes, other changes to pages need an explicit `invalidate`.
+
+        """
+
+        if self._sorted is None or len(self._sorted) != len(self.pages):
+            self._sorted = sorted(self.pages, key=sort_key)
+            self._positions = {page: i for i, page in enumerate(self._sorted)}
+
+        return self._sorted
+
+    def position(self, page):
+        """Return the index of a page in the sorted page order."""
+
+        self.sorted
+
+        try:
+            return self._positions[page]
+        except KeyError:
+            raise ValueError(f"{page.name} is not in section {self.name}")
+
+    def invalidate(self):
+        """Clear the cached page order."""
 
-        default_keys = ("date", "title")
-        key = lambda page: tuple(page.metadata[k] for k in default_keys)
-        return sorted(self.pages, key=key)
+        self._sorted = None
+        self._positions = None
 
     @property
     def all_pages(self):
@@ -98,6 +191,8 @@ class Category:
 
     """
 
+    __slots__ = ("name", "item_name", "pages", "items", "templates", "_sorted", "_url")
+
     def __init__(self, name, item_name):
         self.name = name
         self.item_name = item_name
@@ -105,88 +200,173 @@ class Category:
         self.pages = []
         self.items = []
 
-        self.templates = [self.name, "category"]
+        self.templates = (self.name, "category")
+
+        self._sorted = None
+        self._url = None
 
-    @cached_property
+    @property
     def url(self):
         """Return the category URL."""
 
-        template = "{{ category.name }}/index.html"
-        args = {"category": self}
-        return Renderer.render_from_string(template, args)
+        if self._url is None:
+            self._url = render_url(CATEGORY_URL, {"category": self})
+
+        return self._url
 
     @property
     def sorted(self):
-        """Return category items sorted in count, value order."""
+        """Return category items sorted in count, value order.
+
+        The order is cached and recomputed when the number of items
+        changes.
+
+        """
+
+        if self._sorted is None or len(self._sorted) != len(self.items):
+            key = lambda item: (-item.count, item.value)
+            self._sorted = sorted(self.items, key=key)
 
-        return sorted(self.items, key=lambda item: (-item.count, item.value))
+        return self._sorted
+
+    @property
+    def dependencies(self):
+        """Return pages whose content can change the category output."""
+
+        return self.pages
 
 
 class CategoryItem:
-    """A value associated with a category key."""
+    """A value associated with a category key.
+
+    Item pages are filled in by `load_categories` in a single pass over
+    the site, in site page order.
+
+    """
+
+    __slots__ = ("value", "category", "pages", "templates", "_sorted", "_url")
 
     def __init__(self, category, value):
         self.value = value
         self.category = category
 
-        self.templates = [self.value, self.category.item_name, "item"]
+        self.pages = []
+        self.templates = (self.value, self.category.item_name, "item")
+
+        self._sorted = None
+        self._url = None
 
-    @cached_property
+    @property
     def url(self):
         """Return the category item URL."""
 
-        template = "{{ item.category.name }}/{{ item.value }}"
-        args = {"item": self}
-        return Renderer.render_from_string(template, args)
-
-    @property
-    def pages(self):
-        """Yield all pages with this category item."""
+        if self._url is None:
+            self._url = render_url(ITEM_URL, {"item": self})
 
-        for page in self.category.pages:
-            if self.value in page.metadata.get(self.category.name):
-                yield page
+        return self._url
 
     @property
     def sorted(self):
-        """Return pages sorted in date, title order."""
+        """Return pages sorted in date, title order.
+
+        The order is cached and recomputed when the number of pages
+        changes.
+
+        """
+
+        if self._sorted is None or len(self._sorted) != len(self.pages):
+            self._sorted = sorted(self.pages, key=sort_key)
 
-        default_keys = ("date", "title")
-        key = lambda page: tuple(page.metadata[k] for k in default_keys)
-        return sorted(self.pages, key=key)
+        return self._sorted
 
     @property
     def count(self):
         """Return the number of times a category item is used on a page."""
 
-        return sum(1 for page in self.pages)
+        return len(self.pages)
+
+    @property
+    def dependencies(self):
+        """Return pages whose content can change the item output."""
+
+        return self.pages
 
 
 class Page:
     """An individual text document corresponding to a file in the content directory.
 
     Pages are read from files during the site build. Each page is a
-    member of a section.
+    member of a section. In streaming builds pages are read without
+    their content, which is converted when first used.
+
+    Metadata keys are interned, so pages share one copy of each key,
+    and the (date, title) sort key is computed once.
 
     """
 
-    def __init__(self, name, content, metadata, section):
+    __slots__ = (
+        "name",
+        "metadata",
+        "section",
+        "source",
+        "loader",
+        "templates",
+        "is_index",
+        "sort_key",
+        "_content",
+        "_url",
+    )
+
+    def __init__(self, name, content, metadata, section, source=None, loader=None):
         self.name = name
-        self.content = content
-        self.metadata = metadata
+        self.metadata = {
+            sys.intern(k) if isinstance(k, str) else k: v for k, v in metadata.items()
+        }
         self.section = section
+        self.source = source
+        self.loader = loader
+
+        self._content = content
+        self._url = None
         self.is_index = name == "_index"
 
-        self.templates = [self.metadata.get("template"), "page"]
+        template = self.metadata.get("template")
+        self.templates = (template, "page") if template else PAGE_TEMPLATES
 
         if self.metadata.get("date"):
-            try:
-                self.metadata["date"] = parse(self.metadata.get("date"))
-            except TypeError:
+            with stats.timer("dates"):
+                self.metadata["date"] = parse_date(self.metadata["date"])
 
-                pass
+        try:
+            self.sort_key = (self.metadata["date"], self.metadata["title"])
+        except KeyError:
+            self.sort_key = None
+
+    @property
+    def content(self):
+        """Return the converted page content.
+
+        Pages built without content load it on demand from their
+        source through the content loader.
+
+        """
+
+        if self._content is None and self.loader:
+            return self.loader.load(self.source)
+
+        return self._content
+
+    @content.setter
+    def content(self, content):
+        self._content = content
 
-    @cached_property
+    def release(self):
+        """Drop content loaded on demand once it is no longer needed."""
+
+        if self.loader:
+            self.loader.release(self.source)
+
+    @property
     def url(self):
         """Return the page URL.
 
@@ -195,30 +375,142 @@ class Page:
 
         """
 
-        if self.section.override:
-            template = self.section.override
-        else:
-            template = "{{ page.section.rel }}/{{ page|slug }}"
+        if self._url is None:
+            template = self.section.override or PAGE_URL
+            self._url = render_url(template, {"page": self})
 
-        args = {"page": self}
-        return Renderer.render_from_string(template, args)
+        return self._url
 
     @property
     def next(self):
         """Return the next page in the section in date, title order."""
 
-        try:
-            loc = self.section.sorted.index(self)
-            return self.section.sorted[loc + 1]
+        pages = self.section.sorted
+        loc = self.section.position(self)
 
-        except IndexError:
-            return None
+        return pages[loc + 1] if loc + 1 < len(pages) else None
 
     @property
     def prev(self):
         """Return the previous page in the section in date, title order."""
 
-        loc = self.section.sorted.index(self)
+        loc = self.section.position(self)
         prev = self.section.sorted[loc - 1] if loc else None
 
         return prev
+
+    @property
+    def dependencies(self):
+        """Return pages whose content can change this page's output.
+
+        Index pages depend on every page in their section, other pages
+        depend on their previous and next neighbours.
+
+        """
+
+        if self.is_index:
+            return [self] + self.section.pages
+
+        try:
+            return [self, self.prev, self.next]
+        except (KeyError, TypeError):
+            return [self]
+
+
+def page_size(settings, kind, name):
+    """Return the `paginate` page size of a listing, or None.
+
+    Keys are namespaced by the kind of listing, `section:<name>`,
+    `category:<name>`, or `item:<item name>`. A bare name applies to
+    every kind of listing with that name, and a namespaced key takes
+    precedence over it.
+
+    """
+
+    paginate = settings.get("paginate") or {}
+    return paginate.get(f"{kind}:{name}", paginate.get(name))
+
+
+def paginators(obj, url, per_page):
+    """Yield a `Paginator` for every page of the listing of `obj`.
+
+    Listings are slices of the cached sorted order. If the order can't
+    be computed, pages are listed in site order instead.
+
+    """
+
+    try:
+        listing = obj.sorted
+    except (KeyError, TypeError):
+        listing = obj.pages if isinstance(obj, (Section, CategoryItem)) else obj.items
+
+    count = Paginator(listing, per_page, 1, url).count
+    for number in range(1, count + 1):
+        yield Paginator(listing, per_page, number, url)
+
+
+def paged_url(url, number):
+    """Return the URL of page `number` of a paginated output.
+
+    The first page keeps the output URL, later pages are written to
+    `page/N/` under the output directory, keeping the file name. For
+    example `tags/index.html` becomes `tags/page/2/index.html`.
+
+    """
+
+    if number == 1:
+        return url
+
+    directory, name = posixpath.split(url)
+    return posixpath.join(directory, "page", str(number), name)
+
+
+class Paginator:
+    """One page of a paginated listing, available to templates.
+
+    The paginator holds the full, already sorted listing and slices it
+    for the current page when `items` is used.
+
+    """
+
+    def __init__(self, listing, per_page, number, url):
+        self.listing = listing
+        self.per_page = per_page
+        self.number = number
+        self.base_url = url
+
+        self.count = max(1, -(-len(listing) // per_page))
+
+    @property
+    def items(self):
+        """Return the listing entries on this page."""
+
+        start = (self.number - 1) * self.per_page
+        return self.listing[start : start + self.per_page]
+
+    @property
+    def url(self):
+        """Return the URL of this page."""
+
+        return paged_url(self.base_url, self.number)
+
+    def page_url(self, number):
+        """Return the URL of another page of the listing."""
+
+        return paged_url(self.base_url, number)
+
+    @property
+    def has_next(self):
+        return self.number < self.count
+
+    @property
+    def has_prev(self):
+        return self.number > 1
+
+    @property
+    def next_url(self):
+        return self.page_url(self.number + 1) if self.has_next else None
+
+    @property
+    def prev_url(self):
+        return self.page_url(self.number - 1) if self.has_prev else None
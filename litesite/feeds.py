@@ -0,0 +1,314 @@
+"""Built in Atom/RSS feeds and sitemaps.
+
+Feeds and sitemaps are generated from the site graph rather than from
+templates. Enabled in the site config with the `feeds` and `sitemap`
+settings, and `base_url` for absolute links:
+
+    ## config.yaml
+    base_url: https://www.example.org
+    title: Example
+    sitemap: true
+    feeds:
+      formats: [atom, rss]
+      limit: 20
+      sections: true
+      items: true
+
+A site wide feed is written to `atom.xml` and `rss.xml`, section feeds
+to `<section>/atom.xml`, and category item feeds to
+`<category>/<item>.atom.xml`. Feeds hold the `limit` most recent dated
+pages, selected with a heap instead of sorting every page. Sitemaps
+over 50,000 URLs are split into `sitemap-N.xml` files listed in a
+`sitemap.xml` index. Every page of a paginated listing is listed in
+the sitemap. Output is produced as a stream of chunks.
+
+"""
+
+import datetime
+import heapq
+import posixpath
+from html import escape
+
+from litesite.content import page_size, paginators
+
+FEED_DEFAULTS = {"formats": ["atom"], "limit": 20, "sections": True, "items": True}
+SITEMAP_DEFAULTS = {"limit": 50000}
+
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>\n'
+
+
+def options(setting, defaults):
+    """Return options for a setting which is either true or a dict."""
+
+    if isinstance(setting, dict):
+        return dict(defaults, **setting)
+
+    return dict(defaults)
+
+
+def absolute(base, url):
+    """Join an output URL onto the site base URL."""
+
+    return base.rstrip("/") + "/" + posixpath.normpath(url).lstrip("/")
+
+
+def page_date(page):
+    """Return a page date as a timezone aware datetime, or None.
+
+    Dates without a time are taken as midnight and naive datetimes as
+    UTC, so every page date can be compared.
+
+    """
+
+    date = page.metadata.get("date")
+
+    if isinstance(date, datetime.datetime):
+        return date if date.tzinfo else date.replace(tzinfo=datetime.timezone.utc)
+
+    if isinstance(date, datetime.date):
+        return datetime.datetime.combine(date, datetime.time(), datetime.timezone.utc)
+
+    return None
+
+
+def recent(pages, limit):
+    """Return the `limit` most recent dated pages, newest first."""
+
+    dated = ((page_date(page), i, page) for i, page in enumerate(pages))
+    dated = (entry for entry in dated if entry[0] is not None)
+
+    return [page for _, _, page in heapq.nlargest(limit, dated)]
+
+
+class Feed:
+    """An Atom or RSS feed of the most recent pages in a collection."""
+
+    def __init__(self, site, fmt, url, title, link, entries):
+        self.site = site
+        self.fmt = fmt
+        self.url = url
+        self.name = url
+        self.title = title
+        self.link = link
+        self.entries = entries
+
+    @property
+    def dependencies(self):
+        """Return the pages included in the feed."""
+
+        return self.entries
+
+    def chunks(self):
+        """Yield the feed XML in chunks."""
+
+        base = self.site.settings.get("base_url", "")
+
+        if self.fmt == "rss":
+            yield from self.rss(base)
+        else:
+            yield from self.atom(base)
+
+    def atom(self, base):
+        from litesite.filters import canonify_media
+
+        link = absolute(base, self.link)
+        updated = page_date(self.entries[0])
+
+        yield XML_DECLARATION
+        yield '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+        yield f"<title>{escape(self.title)}</title>\n"
+        yield f'<link href="{escape(absolute(base, self.url))}" rel="self"/>\n'
+        yield f'<link href="{escape(link)}"/>\n'
+        yield f"<id>{escape(link)}</id>\n"
+        yield f"<updated>{updated.isoformat()}</updated>\n"
+
+        for page in self.entries:
+            url = absolute(base, page.url)
+            content = canonify_media(page.content or "", url)
+
+            yield "<entry>\n"
+            yield f"<title>{escape(str(page.metadata.get('title', page.name)))}</title>\n"
+            yield f'<link href="{escape(url)}"/>\n'
+            yield f"<id>{escape(url)}</id>\n"
+            yield f"<updated>{page_date(page).isoformat()}</updated>\n"
+            yield f'<content type="html">{escape(content)}</content>\n'
+            yield "</entry>\n"
+
+        yield "</feed>\n"
+
+    def rss(self, base):
+        import email.utils
+
+        from litesite.filters import canonify_media
+
+        link = absolute(base, self.link)
+        updated = page_date(self.entries[0])
+
+        yield XML_DECLARATION
+        yield '<rss version="2.0">\n<channel>\n'
+        yield f"<title>{escape(self.title)}</title>\n"
+        yield f"<link>{escape(link)}</link>\n"
+        yield f"<description>{escape(self.title)}</description>\n"
+        yield f"<lastBuildDate>{email.utils.format_datetime(updated)}</lastBuildDate>\n"
+
+        for page in self.entries:
+            url = absolute(base, page.url)
+            content = canonify_media(page.content or "", url)
+            date = email.utils.format_datetime(page_date(page))
+
+            yield "<item>\n"
+            yield f"<title>{escape(str(page.metadata.get('title', page.name)))}</title>\n"
+            yield f"<link>{escape(url)}</link>\n"
+            yield f'<guid isPermaLink="true">{escape(url)}</guid>\n'
+            yield f"<pubDate>{date}</pubDate>\n"
+            yield f"<description>{escape(content)}</description>\n"
+            yield "</item>\n"
+
+        yield "</channel>\n</rss>\n"
+
+
+class Sitemap:
+    """A sitemap, or a sitemap index of other sitemaps."""
+
+    def __init__(self, site, url, entries, pages, index=False):
+        self.site = site
+        self.url = url
+        self.name = url
+        self.entries = entries
+        self.pages = pages
+        self.index = index
+
+    @property
+    def dependencies(self):
+        """Return every page, since any page can change a sitemap."""
+
+        return self.pages
+
+    def chunks(self):
+        """Yield the sitemap XML in chunks."""
+
+        base = self.site.settings.get("base_url", "")
+        ns = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+        root, tag = ("sitemapindex", "sitemap") if self.index else ("urlset", "url")
+
+        yield XML_DECLARATION
+        yield f"<{root} {ns}>\n"
+
+        for url, lastmod in self.entries:
+            yield f"<{tag}><loc>{escape(absolute(base, url))}</loc>"
+            if lastmod:
+                yield f"<lastmod>{lastmod.isoformat()}</lastmod>"
+            yield f"</{tag}>\n"
+
+        yield f"</{root}>\n"
+
+
+def listing_urls(url, obj, per_page):
+    """Yield the URL of every page of a paginated output."""
+
+    if not per_page:
+        yield url
+        return
+
+    for paginator in paginators(obj, url, per_page):
+        yield paginator.url
+
+
+def site_urls(site):
+    """Yield the URL and last modified date of every rendered output.
+
+    Every page of a paginated listing is included, later pages without
+    a date.
+
+    """
+
+    settings = site.settings
+
+    for page in site.pages:
+        size = page_size(settings, "section", page.section.name)
+        urls = listing_urls(page.url, page.section, size if page.is_index else None)
+        yield next(urls), page_date(page)
+        for url in urls:
+            yield url, None
+
+    for category in site.categories:
+        size = page_size(settings, "category", category.name)
+        for url in listing_urls(category.url, category, size):
+            yield url, None
+
+        size = page_size(settings, "item", category.item_name)
+        for item in category.items:
+            for url in listing_urls(item.url, item, size):
+                yield url, None
+
+
+def sitemaps(site):
+    """Yield the site sitemap, split into parts if it is too large."""
+
+    opts = options(site.settings["sitemap"], SITEMAP_DEFAULTS)
+    limit = opts["limit"]
+
+    pages = list(site.pages)
+    entries = list(site_urls(site))
+
+    if len(entries) <= limit:
+        yield Sitemap(site, "sitemap.xml", entries, pages)
+        return
+
+    parts = []
+    for n, i in enumerate(range(0, len(entries), limit), 1):
+        url = f"sitemap-{n}.xml"
+        parts.append((url, None))
+        yield Sitemap(site, url, entries[i : i + limit], pages)
+
+    yield Sitemap(site, "sitemap.xml", parts, pages, index=True)
+
+
+def feeds(site):
+    """Yield the site wide, section, and category item feeds.
+
+    Every collection is visited once, section feeds only include pages
+    directly in the section. Feeds with no dated pages are skipped.
+
+    """
+
+    settings = site.settings
+    opts = options(settings["feeds"], FEED_DEFAULTS)
+    title = settings.get("title", "")
+    limit = opts["limit"]
+
+    collections = [("", title, "", [page for page in site.pages if not page.is_index])]
+
+    if opts["sections"]:
+        for section in site.sections:
+            if section.parent is None:
+                continue
+
+            link = section.index.url if section.index else section.rel
+            name = f"{title} - {section.name}" if title else section.name
+            collections.append((f"{section.rel}/", name, link, section.pages))
+
+    if opts["items"]:
+        for category in site.categories:
+            for item in category.items:
+                prefix = f"{category.name}/{item.value}."
+                name = f"{title} - {item.value}" if title else str(item.value)
+                collections.append((prefix, name, item.url, item.pages))
+
+    for prefix, name, link, pages in collections:
+        entries = recent(pages, limit)
+        if not entries:
+            continue
+
+        for fmt in opts["formats"]:
+            yield Feed(site, fmt, f"{prefix}{fmt}.xml", name, link, entries)
+
+
+def feed_outputs(site):
+    """Yield every feed and sitemap output enabled in the settings."""
+
+    if site.settings.get("feeds"):
+        yield from feeds(site)
+
+    if site.settings.get("sitemap"):
+        yield from sitemaps(site)
@@ -5,15 +5,20 @@ they are available during template rendering.
 
 """
 
+import re
 from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup
-from dateutil.parser import parse
+try:
+    from jinja2 import pass_context
+except ImportError:
+    from jinja2 import contextfilter as pass_context
 
 
 def datetime(string):
     """Parse a date or datetime string with dateutil.parse"""
 
+    from dateutil.parser import parse
+
     return parse(string)
 
 
@@ -49,22 +54,188 @@ def canonify(url, base):
     return urljoin(base, url)
 
 
+@pass_context
+def asset(context, path):
+    """Return the site path of a static asset.
+
+    Fingerprinted assets are looked up in the asset mapping of the
+    site being rendered, other paths are returned unchanged.
+
+    """
+
+    site = context.get("site")
+    assets = getattr(site, "assets", None) or {}
+
+    prefix = "/" if path.startswith("/") else ""
+    return prefix + assets.get(path.lstrip("/"), path.lstrip("/"))
+
+
+## Link attributes rewritten by canonify_media, per tag
+MEDIA_ATTRIBUTES = {
+    "a": {"href"},
+    "audio": {"src"},
+    "img": {"src", "srcset"},
+    "source": {"src", "srcset"},
+    "video": {"src", "poster"},
+}
+
+## Comments are matched first so tags inside them are left alone
+MEDIA_TAG = re.compile(
+    r"<!--.*?-->|<(%s)(\s(?:[^>\"']|\"[^\"]*\"|'[^']*')*)?>"
+    % "|".join(MEDIA_ATTRIBUTES),
+    re.IGNORECASE | re.DOTALL,
+)
+
+ATTRIBUTE = re.compile(
+    r"""(\s)([^\s=/>]+)(\s*=\s*)("[^"]*"|'[^']*'|[^\s"'>]+)""",
+)
+
+
+def canonify_srcset(srcset, base):
+    """Convert every URL in a srcset attribute value to absolute."""
+
+    candidates = []
+    for candidate in srcset.split(","):
+        parts = candidate.strip().split(None, 1)
+        if parts:
+            parts[0] = canonify(parts[0], base)
+        candidates.append(" ".join(parts))
+
+    return ", ".join(candidates)
+
+
+def canonify_tag(match, base):
+    """Rewrite the link attributes of a single start tag."""
+
+    tag, attrs = match.group(1), match.group(2)
+    if not tag or not attrs:
+        return match.group(0)
+
+    names = MEDIA_ATTRIBUTES[tag.lower()]
+
+    def attribute(m):
+        space, name, equals, value = m.groups()
+        if name.lower() not in names:
+            return m.group(0)
+
+        quote = value[0] if value[0] in "\"'" else ""
+        url = value[1:-1] if quote else value
+        if not url.strip():
+            return m.group(0)
+
+        if name.lower() == "srcset":
+            url = canonify_srcset(url, base)
+        else:
+            url = canonify(url.strip(), base)
+
+        quote = quote or '"'
+        return f"{space}{name}{equals}{quote}{url}{quote}"
+
+    start = match.start(2) - match.start(0)
+    end = match.end(2) - match.start(0)
+    text = match.group(0)
+
+    return text[:start] + ATTRIBUTE.sub(attribute, attrs) + text[end:]
+
+
 def canonify_media(content, base):
-    """Convert all img and video tag src links to absolute."""
+    """Convert media and link URLs in HTML content to absolute.
+
+    Rewrites `src` and `srcset` on img, video, audio and source tags,
+    video `poster` and a `href`. Start tags are matched with a regular
+    expression and everything else is left untouched.
+
+    """
+
+    return MEDIA_TAG.sub(lambda match: canonify_tag(match, base), content)
+
+
+@pass_context
+def srcset(context, path, fmt=None):
+    """Return a `srcset` attribute value for a static image.
+
+    Lists the derivatives of the image in its own format, or in `fmt`
+    if given, with their widths. Returns an empty string for images
+    without derivatives.
 
-    soup = BeautifulSoup(content, features="html.parser")
-    for media in ["img", "video"]:
-        for element in soup.findAll(media):
-            element["src"] = canonify(element["src"], base)
+    """
+
+    site = context.get("site")
+    images = getattr(site, "images", None) or {}
+
+    rel = path.lstrip("/")
+    fmt = fmt or rel.rsplit(".", 1)[-1].lower()
+    prefix = "/" if path.startswith("/") else ""
+
+    candidates = images.get(rel, [])
+    return ", ".join(
+        f"{prefix}{image.url} {image.width}w"
+        for image in candidates
+        if image.format == fmt
+    )
+
+
+IMG_TAG = re.compile(r"""<img(\s(?:[^>"']|"[^"]*"|'[^']*')*)>""", re.IGNORECASE)
+
+
+@pass_context
+def responsive(context, content, sizes="100vw"):
+    """Add responsive image markup to img tags in HTML content.
+
+    Images with derivatives get a `srcset` and `sizes`, and are wrapped
+    in a `picture` element with a `source` for every other derivative
+    format. Tags which already have a `srcset` are left as they are.
+
+    """
 
-    return str(soup)
+    site = context.get("site")
+    images = getattr(site, "images", None) or {}
+    if not images:
+        return content
+
+    def rewrite(match):
+        attrs = {
+            m.group(2).lower(): m.group(4).strip("\"'")
+            for m in ATTRIBUTE.finditer(match.group(1))
+        }
+        src = attrs.get("src", "")
+        rel = src.lstrip("/")
+        if "srcset" in attrs or rel not in images:
+            return match.group(0)
+
+        prefix = "/" if src.startswith("/") else ""
+        own = rel.rsplit(".", 1)[-1].lower()
+        formats = {}
+        for image in images[rel]:
+            candidate = f"{prefix}{image.url} {image.width}w"
+            formats.setdefault(image.format, []).append(candidate)
+
+        tag = match.group(0)
+        if own in formats:
+            end = -2 if tag.endswith("/>") else -1
+            extra = f' srcset="{", ".join(formats.pop(own))}" sizes="{sizes}"'
+            tag = tag[:end].rstrip() + extra + tag[end:]
+
+        if not formats:
+            return tag
+
+        sources = "".join(
+            f'<source type="image/{fmt}" srcset="{", ".join(candidates)}" sizes="{sizes}">'
+            for fmt, candidates in formats.items()
+        )
+        return f"<picture>{sources}{tag}</picture>"
+
+    return IMG_TAG.sub(rewrite, content)
 
 
 filters = {
+    "asset": asset,
     "canonify": canonify,
     "canonify_media": canonify_media,
     "date": date,
     "datetime": datetime,
     "isoformat": isoformat,
+    "responsive": responsive,
     "slug": slug,
+    "srcset": srcset,
 }
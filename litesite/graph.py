@@ -0,0 +1,67 @@
+"""Site graph export.
+
+The graph describes sections, pages, and categories with their URLs
+and metadata, without any page content. It is built from front matter
+alone, so it is cheap to produce for large sites.
+
+"""
+
+import datetime
+import json
+
+
+def default(obj):
+    """JSON encoder for values found in page metadata."""
+
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()
+
+    return str(obj)
+
+
+def site_graph(site):
+    """Return a JSON serializable description of the site graph."""
+
+    sections = []
+    for section in site.sections:
+        sections.append(
+            {
+                "name": section.name,
+                "rel": section.rel,
+                "parent": section.parent.rel if section.parent else None,
+                "index": section.index.url if section.index else None,
+                "pages": [page.url for page in section.pages],
+            }
+        )
+
+    pages = []
+    for page in site.pages:
+        pages.append(
+            {
+                "name": page.name,
+                "source": page.source,
+                "section": page.section.rel,
+                "url": page.url,
+                "metadata": page.metadata,
+            }
+        )
+
+    categories = []
+    for category in site.categories:
+        items = [
+            {
+                "value": item.value,
+                "url": item.url,
+                "pages": [page.url for page in item.pages],
+            }
+            for item in category.items
+        ]
+        categories.append({"name": category.name, "url": category.url, "items": items})
+
+    return {"sections": sections, "pages": pages, "categories": categories}
+
+
+def dump(site, fp, indent=None):
+    """Write the site graph as JSON to a file object."""
+
+    json.dump(site_graph(site), fp, default=default, indent=indent)
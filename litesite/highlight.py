@@ -0,0 +1,197 @@
+"""Code block highlighting cache.
+
+The codehilite and fenced_code extensions highlight every code block
+with Pygments on every conversion. Sites often repeat the same snippets
+across many pages, so highlighted blocks are memoized by their source,
+language, and highlighting options. The cache is kept in memory by each
+`Reader`, and optionally in an on-disk `Cache` shared between builds
+and worker processes.
+
+The cache is added to a Markdown instance with `HighlightExtension`,
+which replaces the codehilite and fenced_code processors with
+subclasses that look blocks up before highlighting them.
+
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+
+from markdown.extensions import Extension
+from markdown.extensions.codehilite import (
+    CodeHilite,
+    CodeHiliteExtension,
+    HiliteTreeprocessor,
+    parse_hl_lines,
+)
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+
+from litesite.stats import stats
+
+try:
+    from pygments import __version__ as PYGMENTS_VERSION
+except ImportError:
+    PYGMENTS_VERSION = None
+
+## Default number of highlighted blocks kept in memory
+DEFAULT_SIZE = 4096
+
+
+class HighlightCache:
+    """Least recently used cache of highlighted blocks.
+
+    Misses in memory fall through to `store`, an on-disk `Cache`, if
+    one is set.
+
+    """
+
+    def __init__(self, size=DEFAULT_SIZE, store=None):
+        self.size = size
+        self.store = store
+        self.blocks = OrderedDict()
+
+    def get(self, key):
+        """Return the highlighted HTML for a key, or None."""
+
+        html = self.blocks.get(key)
+        if html is not None:
+            self.blocks.move_to_end(key)
+            return html
+
+        if self.store:
+            html = self.store.get(key)
+            if html is not None:
+                self.remember(key, html)
+
+        return html
+
+    def set(self, key, html):
+        """Store highlighted HTML in memory and in the store."""
+
+        self.remember(key, html)
+
+        if self.store:
+            self.store.set(key, html)
+
+    def remember(self, key, html):
+        self.blocks[key] = html
+        if len(self.blocks) > self.size:
+            self.blocks.popitem(last=False)
+
+    def hilite(self, code):
+        """Return the highlighted HTML of a `CodeHilite` block."""
+
+        key = block_key(code)
+
+        with stats.timer("highlight cache"):
+            html = self.get(key)
+
+        if html is None:
+            html = code.hilite()
+            self.set(key, html)
+
+        return html
+
+
+def block_key(block):
+    """Return the cache key for a code block before highlighting."""
+
+    data = [PYGMENTS_VERSION, vars(block)]
+    text = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedHiliteTreeprocessor(HiliteTreeprocessor):
+    """Highlight indented code blocks through a `HighlightCache`."""
+
+    def __init__(self, md, cache):
+        super().__init__(md)
+        self.cache = cache
+
+    def run(self, root):
+        for block in root.iter("pre"):
+            if len(block) == 1 and block[0].tag == "code":
+                code = CodeHilite(
+                    self.code_unescape(block[0].text),
+                    linenums=self.config["linenums"],
+                    guess_lang=self.config["guess_lang"],
+                    css_class=self.config["css_class"],
+                    style=self.config["pygments_style"],
+                    noclasses=self.config["noclasses"],
+                    tab_length=self.md.tab_length,
+                    use_pygments=self.config["use_pygments"],
+                )
+                placeholder = self.md.htmlStash.store(self.cache.hilite(code))
+                block.clear()
+                block.tag = "p"
+                block.text = placeholder
+
+
+class CachedFencedBlockPreprocessor(FencedBlockPreprocessor):
+    """Highlight fenced code blocks through a `HighlightCache`."""
+
+    def __init__(self, md, cache):
+        super().__init__(md)
+        self.cache = cache
+
+    def run(self, lines):
+        if not self.checked_for_codehilite:
+            for ext in self.md.registeredExtensions:
+                if isinstance(ext, CodeHiliteExtension):
+                    self.codehilite_conf = ext.config
+                    break
+
+            self.checked_for_codehilite = True
+
+        text = "\n".join(lines)
+        while True:
+            m = self.FENCED_BLOCK_RE.search(text)
+            if not m:
+                break
+
+            if self.codehilite_conf:
+                conf = {key: value[0] for key, value in self.codehilite_conf.items()}
+                code = CodeHilite(
+                    m.group("code"),
+                    linenums=conf["linenums"],
+                    guess_lang=conf["guess_lang"],
+                    css_class=conf["css_class"],
+                    style=conf["pygments_style"],
+                    use_pygments=conf["use_pygments"],
+                    lang=(m.group("lang") or None),
+                    noclasses=conf["noclasses"],
+                    hl_lines=parse_hl_lines(m.group("hl_lines")),
+                )
+                html = self.cache.hilite(code)
+            else:
+                lang = self.LANG_TAG % m.group("lang") if m.group("lang") else ""
+                html = self.CODE_WRAP % (lang, self._escape(m.group("code")))
+
+            placeholder = self.md.htmlStash.store(html)
+            text = f"{text[:m.start()]}\n{placeholder}\n{text[m.end():]}"
+
+        return text.split("\n")
+
+
+class HighlightExtension(Extension):
+    """Highlight code blocks of one Markdown instance through `cache`.
+
+    Must be loaded after the codehilite and fenced_code extensions, so
+    their processors are registered already.
+
+    """
+
+    def __init__(self, cache, **kwargs):
+        self.cache = cache
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md):
+        if "hilite" in md.treeprocessors:
+            old = md.treeprocessors["hilite"]
+            hiliter = CachedHiliteTreeprocessor(md, self.cache)
+            hiliter.config = old.config
+            md.treeprocessors.register(hiliter, "hilite", 30)
+
+        if "fenced_code_block" in md.preprocessors:
+            fenced = CachedFencedBlockPreprocessor(md, self.cache)
+            md.preprocessors.register(fenced, "fenced_code_block", 25)
@@ -0,0 +1,234 @@
+"""Responsive image derivatives.
+
+JPEG and PNG files in the `static` directory are resized to each of
+the configured widths, and optionally converted to other formats such
+as WebP, when the `images` setting is enabled:
+
+    ## config.yaml
+    images:
+      widths: [480, 960, 1600]
+      formats: [webp]
+      quality: 80
+
+Derivatives of `img/photo.jpg` are written next to it as
+`img/photo-480w.jpg`, `img/photo-480w.webp`, and so on. Widths larger
+than the original are skipped. Other formats are also written at the
+original width.
+
+Derivatives are generated in a process pool and kept in the build
+cache directory keyed by the source hash, width, format, and quality.
+A rebuild only processes new or changed images, and cached
+derivatives no longer produced by a build are removed. Pillow, from
+the `images` extra, is required when the stage is enabled, and only
+imported once an image needs processing.
+
+"""
+
+import importlib.util
+import json
+import os
+from collections import namedtuple
+
+from litesite.assets import mirror
+from litesite.manifest import cache_dir, digest
+from litesite.stats import stats
+
+RASTER = {".jpg", ".jpeg", ".png"}
+DEFAULTS = {"widths": [480, 960, 1600], "formats": ["webp"], "quality": 80}
+
+## Pillow format names for output extensions
+PIL_FORMATS = {
+    "jpg": "JPEG",
+    "jpeg": "JPEG",
+    "png": "PNG",
+    "webp": "WEBP",
+    "avif": "AVIF",
+}
+
+## A generated image, `url` is relative to the site root
+Derivative = namedtuple("Derivative", ["url", "width", "format"])
+
+
+def image_options(settings):
+    """Return the image options, or None if the stage is disabled."""
+
+    setting = settings.get("images")
+    if not setting:
+        return None
+
+    if isinstance(setting, dict):
+        return dict(DEFAULTS, **setting)
+
+    return dict(DEFAULTS)
+
+
+def derivative_name(rel, width, fmt):
+    """Return the output path of a derivative of an asset."""
+
+    base, _ = os.path.splitext(rel)
+    return f"{base}-{width}w.{fmt}"
+
+
+def make_derivatives(source, sha, widths, formats, quality, directory):
+    """Write the missing derivatives of an image to the cache directory.
+
+    Returns a list of (width, format, cache path) tuples. Runs in a
+    worker process.
+
+    """
+
+    from PIL import Image
+
+    results = []
+    with Image.open(source) as image:
+        original = os.path.splitext(source)[1][1:].lower()
+        targets = [(w, original) for w in sorted(widths) if w < image.width]
+        targets += [
+            (w, fmt) for w in sorted(widths) if w < image.width for fmt in formats
+        ]
+        targets += [(image.width, fmt) for fmt in formats]
+
+        ## The original format may also be listed in `formats`
+        for width, fmt in dict.fromkeys(targets):
+            path = os.path.join(directory, f"{sha}-{width}-{quality}.{fmt}")
+            results.append((width, fmt, path))
+            if os.path.exists(path):
+                continue
+
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS)
+            if PIL_FORMATS.get(fmt) == "JPEG" and resized.mode not in ("RGB", "L"):
+                resized = resized.convert("RGB")
+
+            tmp = f"{path}.{os.getpid()}.tmp"
+            resized.save(tmp, PIL_FORMATS.get(fmt, fmt.upper()), quality=quality)
+            os.replace(tmp, path)
+
+    return results
+
+
+def make_task(task):
+    return make_derivatives(*task)
+
+
+def load_index(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def process_images(settings, assets):
+    """Generate derivatives of the raster images among static assets.
+
+    Returns a mapping from asset path to its derivatives, smallest
+    first.
+
+    """
+
+    opts = image_options(settings)
+    if not opts or not assets:
+        return {}
+
+    if importlib.util.find_spec("PIL") is None:
+        raise ImportError(
+            "the images setting requires Pillow, install it with "
+            "`pip install litesite[images]`"
+        )
+
+    static = settings["static"]
+    dest = settings["site"]
+    directory = os.path.join(cache_dir(settings), "images")
+    os.makedirs(directory, exist_ok=True)
+
+    index_path = os.path.join(directory, "index.json")
+    index = load_index(index_path)
+    key = digest(json.dumps(opts, sort_keys=True))
+
+    with stats.timer("images"):
+        done = {}
+        pending = []
+        for rel in sorted(assets):
+            if os.path.splitext(rel)[1].lower() not in RASTER:
+                continue
+
+            source = os.path.join(static, rel)
+            stat = os.stat(source)
+            fingerprint = [stat.st_mtime_ns, stat.st_size]
+
+            entry = index.get("sources", {}).get(rel)
+            if (
+                entry
+                and entry["fingerprint"] == fingerprint
+                and entry["options"] == key
+            ):
+                if all(os.path.exists(path) for _, _, path in entry["derivatives"]):
+                    done[rel] = entry
+                    continue
+
+            with open(source, "rb") as f:
+                sha = digest(f.read())
+
+            entry = {"fingerprint": fingerprint, "options": key, "sha": sha}
+            task = (
+                source,
+                sha,
+                opts["widths"],
+                opts["formats"],
+                opts["quality"],
+                directory,
+            )
+            pending.append((rel, entry, task))
+
+        workers = settings.get("workers") or 1
+        tasks = [task for _, _, task in pending]
+        if workers > 1 and len(tasks) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(workers) as executor:
+                results = list(executor.map(make_task, tasks))
+        else:
+            results = [make_task(task) for task in tasks]
+
+        for (rel, entry, _), derivatives in zip(pending, results):
+            done[rel] = dict(entry, derivatives=derivatives)
+
+        images = {}
+        outputs = set()
+        for rel, entry in done.items():
+            images[rel] = []
+            for width, fmt, path in entry["derivatives"]:
+                name = derivative_name(assets[rel], width, fmt)
+                mirror(path, os.path.join(dest, name), link=True)
+                images[rel].append(Derivative(name, width, fmt))
+                outputs.add(name)
+
+        for old in index.get("outputs", []):
+            if old not in outputs and os.path.exists(os.path.join(dest, old)):
+                os.remove(os.path.join(dest, old))
+
+        tmp = index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"sources": done, "outputs": sorted(outputs)}, f)
+        os.replace(tmp, index_path)
+
+        prune_cache(directory, done)
+
+    return images
+
+
+def prune_cache(directory, entries):
+    """Remove cached derivatives not used by any of the index `entries`."""
+
+    used = {
+        os.path.basename(path)
+        for entry in entries.values()
+        for _, _, path in entry["derivatives"]
+    }
+
+    for name in os.listdir(directory):
+        if name == "index.json" or name.endswith(".tmp") or name in used:
+            continue
+
+        os.remove(os.path.join(directory, name))
@@ -0,0 +1,300 @@
+"""Build manifest for incremental builds.
+
+The manifest records a fingerprint of every content file and template
+used in a build, along with the converted content of each file and a
+dependency key for every output written. On the next build unchanged
+files are loaded from the manifest instead of being re-converted, and
+only outputs whose dependency key changed are rendered again.
+
+"""
+
+import copy
+import hashlib
+import json
+import os
+import pickle
+
+
+def cache_dir(settings):
+    """Return the directory used for persistent build data."""
+
+    return settings.get("cache_dir") or ".litesite-cache"
+
+
+def digest(data):
+    """Return a hex digest for a str or bytes object."""
+
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+
+    return hashlib.sha1(data).hexdigest()
+
+
+class Manifest:
+    """Record of build inputs and outputs used for incremental builds.
+
+    A manifest is invalidated entirely when the site settings change,
+    and every output is rendered again when any template or the site
+    graph changes.
+    Each shard of a sharded build keeps its own manifest.
+
+    """
+
+    version = 1
+
+    ## Settings which change how a build runs but not what it outputs
+    runtime_keys = {
+        "cache",
+        "cache_dir",
+        "cache_size",
+        "compress",
+        "incremental",
+        "progress",
+        "shard",
+        "snapshot",
+        "stream_cache",
+        "workers",
+    }
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.path = os.path.join(cache_dir(settings), self.filename(settings))
+
+        self.settings_digest = self.digest_settings(settings)
+        self.templates_digest = self.digest_templates(settings.get("templates"))
+
+        self.assets_digest = digest("")
+        self.site_digest = digest("")
+
+        self.files = {}
+        self.outputs = {}
+        self.changed = set()
+
+        old = self.load()
+        self.old_files = old.get("files", {})
+        self.old_outputs = old.get("outputs", {})
+
+    @staticmethod
+    def filename(settings):
+        """Return the manifest file name, one per shard of a sharded build."""
+
+        if not settings.get("shard"):
+            return "manifest.pickle"
+
+        from litesite.shards import parse_shard
+
+        return "manifest-{}-of-{}.pickle".format(*parse_shard(settings["shard"]))
+
+    def rollover(self, carry_files=False):
+        """Start a new build from the state of the current one.
+
+        Used by long running processes which keep the manifest in
+        memory between builds. With `carry_files`, file entries are
+        kept for builds that only read some of the content files.
+
+        """
+
+        self.old_files = self.files
+        self.old_outputs = self.outputs
+        self.files = dict(self.files) if carry_files else {}
+        self.outputs = {}
+        self.changed = set()
+
+        self.templates_digest = self.digest_templates(self.settings.get("templates"))
+
+    def load(self):
+        """Load the previous manifest if it is compatible with this build."""
+
+        try:
+            with open(self.path, "rb") as f:
+                old = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return {}
+
+        if old.get("version") != self.version:
+            return {}
+
+        if old.get("settings") != self.settings_digest:
+            return {}
+
+        return old
+
+    def save(self):
+        """Write the manifest for the current build."""
+
+        data = {
+            "version": self.version,
+            "settings": self.settings_digest,
+            "templates": self.templates_digest,
+            "files": self.files,
+            "outputs": self.outputs,
+        }
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    @classmethod
+    def digest_settings(cls, settings):
+        """Return a digest of the settings that affect build output."""
+
+        relevant = {k: v for k, v in settings.items() if k not in cls.runtime_keys}
+        return digest(json.dumps(relevant, sort_keys=True, default=str))
+
+    @staticmethod
+    def digest_templates(directory):
+        """Return a digest of every file in the template directory."""
+
+        h = hashlib.sha1()
+        if not directory or not os.path.isdir(directory):
+            return h.hexdigest()
+
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    h.update(name.encode("utf-8"))
+                    h.update(f.read())
+
+        return h.hexdigest()
+
+    def track_assets(self, assets, images=None):
+        """Record the static asset mapping used by this build.
+
+        Only fingerprinted assets and image derivatives can change
+        rendered output, so every output is rendered again when one of
+        them changes.
+
+        """
+
+        renamed = {rel: out for rel, out in assets.items() if rel != out}
+        data = json.dumps([renamed, images or {}], sort_keys=True)
+        self.assets_digest = digest(data)
+
+    def track_site(self, site):
+        """Record the site graph used by this build.
+
+        Templates can read site wide data, such as `site.pages` or
+        `site.categories`, so every output is rendered again when a
+        page is added or removed, or a page's URL, title, date, or
+        category membership changes.
+
+        """
+
+        names = [category.name for category in site.categories]
+        graph = []
+        for page in site.pages:
+            meta = page.metadata
+            cats = [meta.get(name) for name in names]
+            graph.append([page.url, meta.get("title"), meta.get("date"), cats])
+
+        graph.sort(key=lambda entry: entry[0])
+        data = json.dumps([names, graph], default=str)
+        self.site_digest = digest(data)
+
+    def lookup(self, source):
+        """Return True if a content file is unchanged since the last build.
+
+        A file is unchanged if its modification time and size match
+        the recorded ones, or failing that if its content hash does.
+        Unchanged files are carried over into the new manifest.
+
+        """
+
+        stat = os.stat(source)
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+        old = self.old_files.get(source)
+
+        if not old:
+            return False
+
+        if old["fingerprint"] != fingerprint:
+            with open(source, "r") as f:
+                if digest(f.read()) != old["sha"]:
+                    return False
+
+        self.files[source] = dict(old, fingerprint=fingerprint)
+        return True
+
+    def store(self, source, sha, content, metadata):
+        """Record a newly converted content file."""
+
+        stat = os.stat(source)
+        self.files[source] = {
+            "fingerprint": (stat.st_mtime_ns, stat.st_size),
+            "sha": sha,
+            "content": content,
+            "metadata": metadata,
+        }
+        self.changed.add(source)
+
+    def get(self, source):
+        """Return converted text and a copy of the metadata for a file."""
+
+        entry = self.files[source]
+        return entry["content"], copy.deepcopy(entry["metadata"])
+
+    def key(self, url, dependencies):
+        """Return the dependency key for an output.
+
+        The key covers the templates, fingerprinted asset names, the
+        site graph, the output URL, and the URL and content hash of
+        every page the output depends on.
+
+        """
+
+        h = hashlib.sha1()
+        h.update(self.templates_digest.encode("utf-8"))
+        h.update(self.assets_digest.encode("utf-8"))
+        h.update(self.site_digest.encode("utf-8"))
+        h.update(url.encode("utf-8"))
+
+        for page in dependencies:
+            if page is None:
+                h.update(b"\0")
+                continue
+
+            entry = self.files.get(page.source)
+            h.update(page.url.encode("utf-8"))
+            h.update(entry["sha"].encode("utf-8") if entry else b"\0")
+
+        return h.hexdigest()
+
+    def fresh(self, out, url, dependencies):
+        """Record an output and return True if it does not need rendering."""
+
+        key = self.key(url, dependencies)
+        self.outputs[out] = key
+
+        return self.old_outputs.get(out) == key and os.path.exists(out)
+
+    def keep(self, out):
+        """Record an output written by another shard, so it isn't pruned.
+
+        It is rendered if it is assigned to this shard again.
+
+        """
+
+        self.outputs.setdefault(out, None)
+
+    def prune(self):
+        """Remove outputs written by the last build but not by this one.
+
+        Compressed siblings of removed outputs are removed as well.
+
+        """
+
+        removed = []
+        for out in self.old_outputs:
+            if out in self.outputs:
+                continue
+
+            for path in (out, out + ".gz", out + ".br"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+            removed.append(out)
+
+        return removed
@@ -0,0 +1,59 @@
+"""Build progress reporting.
+
+Three reporting modes are available, selected with the `progress`
+setting: `names` prints the name of every rendered object, `bar` draws
+a single updating progress bar, and `quiet` prints nothing.
+
+"""
+
+import sys
+import time
+
+
+class Progress:
+    """Report progress through a known number of steps."""
+
+    def __init__(self, mode, total, stream=None):
+        self.mode = mode or "names"
+        self.total = total
+        self.stream = stream
+
+        self.done = 0
+        self.drawn = 0.0
+
+    def update(self, name):
+        """Report one completed step."""
+
+        self.done += 1
+
+        if self.mode == "names":
+            print(name, file=self.stream or sys.stdout)
+        elif self.mode == "bar":
+            now = time.monotonic()
+            if now - self.drawn > 0.1 or self.done == self.total:
+                self.drawn = now
+                self.draw()
+
+    def message(self, text):
+        """Report a message outside of the step count."""
+
+        if self.mode == "names":
+            print(text, file=self.stream or sys.stdout)
+
+    def draw(self):
+        """Draw the progress bar."""
+
+        width = 40
+        frac = self.done / self.total if self.total else 1
+        bar = "#" * int(width * frac)
+        stream = self.stream or sys.stderr
+        stream.write(f"\r[{bar:<{width}}] {self.done}/{self.total}")
+        stream.flush()
+
+    def close(self):
+        """Finish reporting."""
+
+        if self.mode == "bar" and self.total:
+            stream = self.stream or sys.stderr
+            stream.write("\n")
+            stream.flush()
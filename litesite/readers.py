@@ -4,13 +4,76 @@ Currently only markdown is supported.
 
 """
 
-import markdown
+import functools
+import hashlib
+import json
+from collections import OrderedDict
+
+import yaml
+
+from litesite.stats import stats
+
+## Packages whose version can change converted output, and their modules
+DEPENDENCIES = {
+    "Markdown": "markdown",
+    "markdown-full-yaml-metadata": "full_yaml_metadata",
+    "Pygments": "pygments",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def dependency_versions():
+    """Return the installed versions of packages used for conversion.
+
+    Versions are read from package metadata, so the packages are not
+    imported. Python < 3.8 has no `importlib.metadata`, so there the
+    packages are imported and their `__version__` is used instead.
+
+    """
+
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+    except ImportError:  # Python < 3.8
+        return {name: module_version(module) for name, module in DEPENDENCIES.items()}
+
+    versions = {}
+    for name in DEPENDENCIES:
+        try:
+            versions[name] = version(name)
+        except PackageNotFoundError:
+            versions[name] = None
+
+    return versions
+
+
+def module_version(name):
+    """Return the `__version__` of a module, or None."""
+
+    import importlib
+
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        return None
+
+    return getattr(module, "__version__", None)
 
 
 class Reader:
-    """Initialize a markdown file reader and extensions."""
+    """Initialize a markdown file reader and extensions.
+
+    If a `cache` is passed, converted text and metadata are stored in
+    it keyed by a hash of the source text, the extension list, and the
+    versions of the conversion libraries. Highlighted code blocks are
+    memoized across files, and also kept in `highlight_cache` if one
+    is passed.
+
+    Markdown and Pygments are only imported once a file has to be
+    converted, so builds served entirely from caches never load them.
 
-    def __init__(self, user_extensions=None):
+    """
+
+    def __init__(self, user_extensions=None, cache=None, highlight_cache=None):
         extensions = [
             "markdown.extensions.extra",
             "markdown.extensions.smarty",
@@ -21,12 +84,227 @@ class Reader:
         if user_extensions:
             extensions += user_extensions
 
-        self.md = markdown.Markdown(extensions=extensions)
+        self.extensions = extensions
+        self.cache = cache
+        self.highlight_cache = highlight_cache
+
+        salt = json.dumps([extensions, dependency_versions()], sort_keys=True)
+        self.salt = salt.encode("utf-8")
+        self.body_salt = b"body\0" + self.salt
+
+        self._highlights = None
+        self._md = None
+        self._body_md = None
+
+    @property
+    def highlights(self):
+        """Return the in-memory highlight cache, created on first use."""
+
+        if self._highlights is None:
+            from litesite import highlight
+
+            self._highlights = highlight.HighlightCache(store=self.highlight_cache)
+
+        return self._highlights
+
+    @property
+    def md(self):
+        """Return the markdown converter, created on first use."""
+
+        if self._md is None:
+            self._md = self.converter(self.extensions)
+
+        return self._md
+
+    @property
+    def body_md(self):
+        """Return a converter for documents without a metadata block."""
+
+        if self._body_md is None:
+            extensions = [e for e in self.extensions if e != "full_yaml_metadata"]
+            self._body_md = self.converter(extensions)
+
+        return self._body_md
+
+    def converter(self, extensions):
+        """Return a markdown converter highlighting through `highlights`."""
+
+        import markdown
+
+        from litesite import highlight
+
+        cached = highlight.HighlightExtension(self.highlights)
+        return markdown.Markdown(extensions=extensions + [cached])
 
     def read(self, text):
-        """Read a markdown file and YAML metadata."""
+        """Read a markdown file and YAML metadata.
+
+        The markdown instance is reset first so extension state, such
+        as footnotes, does not leak from one file into the next.
+
+        """
+
+        if self.cache:
+            key = self.key(text)
+            with stats.timer("markdown cache"):
+                cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        with stats.timer("markdown"):
+            self.md.reset()
+            self.md.Meta = None
+            content = self.md.convert(text)
+            meta = self.md.Meta or {}
 
-        content = self.md.convert(text)
-        meta = self.md.Meta
+        if self.cache:
+            self.cache.set(key, (content, meta))
 
         return content, meta
+
+    def read_body(self, text):
+        """Convert a markdown file, skipping its YAML metadata block.
+
+        Used when the metadata was already read with `read_front_matter`,
+        so it isn't parsed a second time.
+
+        """
+
+        _, lines = split_front_matter(text)
+        body = "\n".join(lines)
+
+        if self.cache:
+            key = self.key(body, self.body_salt)
+            with stats.timer("markdown cache"):
+                cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        with stats.timer("markdown"):
+            self.body_md.reset()
+            content = self.body_md.convert(body)
+
+        if self.cache:
+            self.cache.set(key, content)
+
+        return content
+
+    def key(self, text, salt=None):
+        """Return the cache key for a source text."""
+
+        h = hashlib.sha256(salt or self.salt)
+        h.update(text.encode("utf-8"))
+
+        return h.hexdigest()
+
+
+def split_front_matter(text):
+    """Split a markdown file into metadata lines and document lines.
+
+    Follows the block delimiting rules of the `full_yaml_metadata`
+    extension, including its handling of an unclosed block, whose lines
+    are both metadata and document. Markdown drops a single blank line
+    at the start of a document before the extension runs, so a block
+    may start on the second line.
+
+    """
+
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    if lines[0] == "" and lines[1:2] == ["---"]:
+        lines = lines[1:]
+
+    if lines[0] != "---":
+        return [], lines
+
+    for i, line in enumerate(lines[1:], 1):
+        if line in ("---", "..."):
+            return lines[1:i], lines[i + 1 :]
+
+    return lines[1:], lines[1:]
+
+
+def read_metadata(text):
+    """Read only the YAML metadata block at the start of a markdown file.
+
+    Follows the block delimiting rules of the `full_yaml_metadata`
+    extension, so the result matches the metadata returned by
+    `Reader.read` without converting the document. Files without a
+    metadata block, or with an empty one, have empty metadata.
+
+    """
+
+    meta_lines, _ = split_front_matter(text)
+    meta_lines = [line.expandtabs(4) for line in meta_lines]
+
+    with stats.timer("yaml"):
+        return yaml.load("\n".join(meta_lines), Loader=yaml.FullLoader) or {}
+
+
+def read_front_matter(path, limit=64 * 1024):
+    """Read only the YAML metadata block of a markdown file.
+
+    The file is read line by line up to the end of the metadata block,
+    so the document body is never read. Files with a metadata block
+    larger than `limit` characters are read in full.
+
+    """
+
+    with open(path, "r") as f:
+        lines = [f.readline()]
+        if lines[0] == "\n":
+            lines.append(f.readline())
+
+        if lines[-1].rstrip("\n") != "---":
+            return {}
+
+        size = sum(len(line) for line in lines)
+
+        for line in f:
+            lines.append(line)
+            size += len(line)
+
+            if line.rstrip("\n") in ("---", "..."):
+                break
+
+            if size > limit:
+                lines.append(f.read())
+                break
+
+    return read_metadata("".join(lines))
+
+
+class ContentLoader:
+    """Convert page content on demand, keeping a bounded number in memory.
+
+    Used when streaming builds, where pages are created from metadata
+    alone. Converted content is kept in a least recently used cache of
+    `size` pages, so templates which use other pages' content don't
+    convert the same page over and over.
+
+    """
+
+    def __init__(self, reader, size=256):
+        self.reader = reader
+        self.size = size
+        self.loaded = OrderedDict()
+
+    def load(self, source):
+        """Return the converted content of a source file."""
+
+        if source in self.loaded:
+            self.loaded.move_to_end(source)
+            return self.loaded[source]
+
+        with open(source, "r") as f:
+            content, _ = self.reader.read(f.read())
+
+        self.loaded[source] = content
+        if len(self.loaded) > self.size:
+            self.loaded.popitem(last=False)
+
+        return content
+
+    def release(self, source):
+        """Drop the converted content of a source file."""
+
+        self.loaded.pop(source, None)
@@ -5,38 +5,74 @@ renderer are loaded from `filters.py`. Template directory is defined
 in the site config file. Nested template directories are not
 supported.
 
+jinja2 and the filters are imported when the first renderer or string
+template is created, so default URL templates render without them.
+
 """
 
+import functools
 import itertools
 import os
 
-from jinja2 import Environment, FileSystemLoader
+from litesite.manifest import cache_dir
+from litesite.stats import stats
+from litesite.writers import Writer
 
-from litesite.filters import filters
+## Template file extensions, in lookup order
+EXTENSIONS = [".html", ".xml"]
 
 
 class Renderer:
-    """Class for jinja2 template lookup and rendering."""
+    """Class for jinja2 template lookup and rendering.
+
+    Template lookups are memoized for the life of the renderer. If the
+    `cache` setting is enabled, compiled templates are also kept in a
+    bytecode cache in the build cache directory, so templates are only
+    parsed again after they change.
+
+    """
 
     def __init__(self, settings):
+        from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+        from litesite.filters import filters
+
         self.env = Environment()
         self.env.filters.update(filters)
 
         loader = FileSystemLoader(settings["templates"])
         self.env.loader = loader
 
+        if settings.get("cache"):
+            directory = os.path.join(cache_dir(settings), "templates")
+            os.makedirs(directory, exist_ok=True)
+            self.env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+        self.lookups = {}
+        self.writer = Writer()
+
     def render(self, out, templates, args):
         """Select the first available template and render to `out`."""
 
-        template = self.lookup(templates)
-        text = template.render(**args)
-
-        os.makedirs(os.path.dirname(out), exist_ok=True)
-        with open(out, "w") as _file:
-            _file.write(text)
+        text = self.render_text(templates, args)
+        self.write(out, text)
 
         return text
 
+    def render_text(self, templates, args):
+        """Select the first available template and render to a string."""
+
+        with stats.timer("template lookup"):
+            template = self.lookup(templates)
+
+        with stats.template(template.name):
+            return template.render(**args)
+
+    def write(self, out, text):
+        """Write rendered text to `out` and return True if it changed."""
+
+        return self.writer.write(out, text)
+
     def lookup(self, templates):
         """Lookup a template from the template directory.
 
@@ -47,23 +83,100 @@ class Renderer:
 
         """
 
-        exts = [".html", ".xml"]
+        key = tuple(templates)
+        template = self.lookups.get(key)
+        if template is not None:
+            return template
 
         template_files = []
-        for f, ext in itertools.product(templates, exts):
+        for f, ext in itertools.product(templates, EXTENSIONS):
             if f is not None:
                 template_files.append(str(f) + ext)
 
-        return self.env.select_template(template_files)
+        template = self.lookups[key] = self.env.select_template(template_files)
+        return template
+
+    def precompile(self):
+        """Compile every template in the template directory.
+
+        Compiled templates are kept by the environment, and written to
+        the bytecode cache if there is one. Files without a template
+        extension are skipped, as are templates which fail to compile,
+        since they may never be used. Returns the compiled names.
+
+        """
+
+        from jinja2 import TemplateSyntaxError
+
+        names = []
+        for name in self.env.list_templates(extensions=[ext[1:] for ext in EXTENSIONS]):
+            try:
+                self.env.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError):
+                continue
+            names.append(name)
+
+        return names
 
     @staticmethod
     def render_from_string(string, args=None):
-        """Render a string template with access to custom filters."""
+        """Render a string template with access to custom filters.
 
-        env = Environment()
-        env.filters.update(filters)
+        String templates share one environment and are compiled once
+        per distinct template string.
 
-        template = env.from_string(string)
+        """
+
+        template = compile_string(string)
         text = template.render(**args) if args else template.render()
 
         return text
+
+
+@functools.lru_cache(maxsize=None)
+def string_environment():
+    """Return the environment shared by all string templates."""
+
+    from jinja2 import Environment
+
+    from litesite.filters import filters
+
+    env = Environment()
+    env.filters.update(filters)
+
+    return env
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_string(string):
+    """Compile a string template, memoized by template source."""
+
+    return string_environment().from_string(string)
+
+
+## Default URL templates and equivalent functions that skip jinja2
+PAGE_URL = "{{ page.section.rel }}/{{ page|slug }}"
+CATEGORY_URL = "{{ category.name }}/index.html"
+ITEM_URL = "{{ item.category.name }}/{{ item.value }}"
+
+url_fast_paths = {
+    PAGE_URL: lambda args: f"{args['page'].section.rel}/{args['page'].metadata['slug']}",
+    CATEGORY_URL: lambda args: f"{args['category'].name}/index.html",
+    ITEM_URL: lambda args: f"{args['item'].category.name}/{args['item'].value}",
+}
+
+
+def render_url(string, args):
+    """Render a URL template.
+
+    The default URL templates are rendered without jinja2, anything
+    else goes through the memoized string template renderer.
+
+    """
+
+    with stats.timer("urls"):
+        fast = url_fast_paths.get(string)
+        if fast:
+            return fast(args)
+
+        return Renderer.render_from_string(string, args)
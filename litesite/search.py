@@ -0,0 +1,313 @@
+"""Full text search index.
+
+Enabled with the `search` setting. Page fields are tokenized into an
+inverted index of terms to the pages containing them, with a score
+per page, written as JSON shards under `search/` in the site
+directory:
+
+    ## config.yaml
+    search:
+      fields:
+        title: 5
+        content: 1
+      prefix: 2
+
+`fields` maps page metadata keys, or `content` for the page body, to
+a score weight. A list of field names weights every field equally.
+Terms are sharded by their first `prefix` characters, so a browser
+only downloads the shard for the term being searched:
+
+    search/index.json           {"prefix": 2, "fields": [...], "shards": ["ab", ...]}
+    search/docs.json            {"<id>": ["<url>", "<title>"], ...}
+    search/shards/ab.json       {"about": [[<id>, <score>], ...], ...}
+
+The inverted index is kept in the build cache directory between
+builds. Only pages whose source files changed are tokenized again, and
+only shards containing their terms are written.
+
+"""
+
+import html
+import json
+import os
+import pickle
+import re
+
+from litesite.manifest import Manifest, cache_dir, digest
+from litesite.stats import stats
+
+DEFAULTS = {"fields": {"title": 5, "content": 1}, "prefix": 2}
+
+TAG = re.compile(r"<[^>]*>")
+WORD = re.compile(r"\w{2,}")
+
+
+def search_options(settings):
+    """Return the search options, or None if search is disabled."""
+
+    setting = settings.get("search")
+    if not setting:
+        return None
+
+    opts = dict(DEFAULTS, **setting) if isinstance(setting, dict) else dict(DEFAULTS)
+    if isinstance(opts["fields"], list):
+        opts["fields"] = {field: 1 for field in opts["fields"]}
+
+    return opts
+
+
+def tokenize(text):
+    """Return the lowercase terms of a text, with HTML tags removed."""
+
+    return WORD.findall(html.unescape(TAG.sub(" ", text)).lower())
+
+
+def field_texts(page, fields):
+    """Return the text of every indexed field of a page."""
+
+    texts = []
+    for field in fields:
+        value = page.content if field == "content" else page.metadata.get(field)
+        if isinstance(value, (list, tuple)):
+            value = " ".join(str(v) for v in value)
+        texts.append("" if value is None else str(value))
+
+    return texts
+
+
+def source_digest(page):
+    """Return the hash of a page's source file, or None if unreadable."""
+
+    try:
+        with open(page.source, "r") as f:
+            return digest(f.read())
+    except (OSError, TypeError):
+        return None
+
+
+def term_scores(texts, weights):
+    """Return a term to score mapping for field texts."""
+
+    scores = {}
+    for text, weight in zip(texts, weights):
+        for term in tokenize(text):
+            scores[term] = scores.get(term, 0) + weight
+
+    return scores
+
+
+class SearchIndex:
+    """Incrementally maintained inverted index of the site pages."""
+
+    def __init__(self, settings, opts):
+        self.settings = settings
+        self.opts = opts
+        self.path = os.path.join(cache_dir(settings), "search.pickle")
+        self.config = digest(json.dumps([opts, settings["site"]], sort_keys=True))
+
+        self.ids = {}
+        self.next_id = 0
+        self.pages = {}
+        self.postings = {}
+        self.docs = {}
+
+        self.load()
+
+    def load(self):
+        """Load the index of the previous build if it is compatible."""
+
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return
+
+        if state.get("config") != self.config:
+            return
+
+        self.ids = state["ids"]
+        self.next_id = state["next_id"]
+        self.pages = state["pages"]
+        self.postings = state["postings"]
+        self.docs = state["docs"]
+
+    def save(self):
+        """Write the index for the next build."""
+
+        state = {
+            "config": self.config,
+            "ids": self.ids,
+            "next_id": self.next_id,
+            "pages": self.pages,
+            "postings": self.postings,
+            "docs": self.docs,
+        }
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def shard(self, term):
+        return term[: self.opts["prefix"]]
+
+    def remove(self, url, touched):
+        """Remove a page's terms from the postings."""
+
+        doc = self.ids[url]
+        _, scores = self.pages.pop(url)
+
+        for term in scores:
+            postings = self.postings[term]
+            postings.pop(doc, None)
+            if not postings:
+                del self.postings[term]
+            touched.add(self.shard(term))
+
+    def add(self, url, key, scores, touched):
+        """Add a page's terms to the postings."""
+
+        doc = self.ids.get(url)
+        if doc is None:
+            doc = self.ids[url] = self.next_id
+            self.next_id += 1
+
+        self.pages[url] = (key, scores)
+
+        for term, score in scores.items():
+            self.postings.setdefault(term, {})[doc] = score
+            touched.add(self.shard(term))
+
+    def update(self, pages, manifest=None):
+        """Update the index from the current site pages.
+
+        Pages are keyed by the settings and the hash of their source
+        file, taken from the `manifest` if one is passed, so unchanged
+        pages are skipped without loading their content. Pages without
+        a readable source are keyed by a hash of their indexed fields.
+        Returns the set of shards whose terms changed.
+
+        """
+
+        fields = list(self.opts["fields"])
+        weights = [self.opts["fields"][field] for field in fields]
+        salt = Manifest.digest_settings(self.settings)
+        touched = set()
+        seen = set()
+
+        for page in pages:
+            url = page.url
+            seen.add(url)
+
+            entry = manifest.files.get(page.source) if manifest else None
+            sha = entry["sha"] if entry else source_digest(page)
+            texts = None
+            if sha:
+                key = salt + sha
+            else:
+                texts = field_texts(page, fields)
+                key = digest(json.dumps(texts))
+
+            old = self.pages.get(url)
+            if old and old[0] == key:
+                continue
+
+            if texts is None:
+                texts = field_texts(page, fields)
+
+            if old:
+                self.remove(url, touched)
+
+            self.add(url, key, term_scores(texts, weights), touched)
+
+            title = page.metadata.get("title", page.name)
+            self.docs[self.ids[url]] = [url, str(title)]
+
+        for url in list(self.pages):
+            if url not in seen:
+                self.remove(url, touched)
+                del self.docs[self.ids.pop(url)]
+
+        return touched
+
+    def shards(self):
+        """Return every shard name with terms in it."""
+
+        return sorted({self.shard(term) for term in self.postings})
+
+    def shard_json(self, names):
+        """Return the JSON text of each named shard.
+
+        Postings are grouped by shard in a single pass over the index,
+        and ordered by score then document id, so the text does not
+        depend on the order of earlier updates.
+
+        """
+
+        shards = {name: {} for name in names}
+        for term, postings in self.postings.items():
+            terms = shards.get(self.shard(term))
+            if terms is not None:
+                terms[term] = sorted(postings.items(), key=lambda p: (-p[1], p[0]))
+
+        return {
+            name: json.dumps(terms, sort_keys=True, separators=(",", ":"))
+            for name, terms in shards.items()
+        }
+
+
+def write_search(site, writer, manifest=None):
+    """Update the search index and write changed shards.
+
+    Returns the paths of the files written.
+
+    """
+
+    settings = site.settings
+    opts = search_options(settings)
+    if not opts:
+        return []
+
+    with stats.timer("search"):
+        index = SearchIndex(settings, opts)
+        pages = [page for page in site.pages if not page.is_index]
+        touched = index.update(pages, manifest)
+
+        directory = os.path.join(settings["site"], "search")
+        shard_dir = os.path.join(directory, "shards")
+        shards = index.shards()
+        meta = {
+            "prefix": opts["prefix"],
+            "fields": list(opts["fields"]),
+            "shards": shards,
+        }
+
+        outputs = {
+            os.path.join(directory, "index.json"): json.dumps(meta, sort_keys=True),
+            os.path.join(directory, "docs.json"): json.dumps(
+                index.docs, sort_keys=True, separators=(",", ":")
+            ),
+        }
+
+        ## Every shard is written if the output directory was removed
+        existing = set(os.listdir(shard_dir)) if os.path.isdir(shard_dir) else set()
+        names = [
+            name for name in shards if name in touched or f"{name}.json" not in existing
+        ]
+        for name, text in index.shard_json(names).items():
+            outputs[os.path.join(shard_dir, f"{name}.json")] = text
+
+        written = []
+        for out, text in outputs.items():
+            if writer.write(out, text):
+                written.append(out)
+
+        for name in touched - set(shards):
+            out = os.path.join(shard_dir, f"{name}.json")
+            if os.path.exists(out):
+                os.remove(out)
+
+        index.save()
+
+    return written
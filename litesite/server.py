@@ -0,0 +1,288 @@
+"""Watch mode and local development server.
+
+A `LiveSite` keeps the built site and its manifest in memory. When
+content files change in place only those files are read again, and
+only outputs whose dependencies changed are rendered. Added or removed
+files rebuild the site graph, reusing every unchanged file from the
+manifest.
+
+The development server serves the output directory and injects a
+small script into HTML pages which reloads the page after each
+rebuild, using server-sent events.
+
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler
+
+try:
+    from http.server import ThreadingHTTPServer
+except ImportError:  # Python < 3.7
+    from http.server import HTTPServer
+    from socketserver import ThreadingMixIn
+
+    class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+
+from litesite.builder import (
+    build_site,
+    load_categories,
+    read_sources,
+    render_site,
+    replace_page,
+)
+from litesite.manifest import Manifest
+from litesite.progress import Progress
+from litesite.watcher import watcher
+
+RELOAD_PATH = "/__livereload"
+
+RELOAD_SCRIPT = (
+    "<script>new EventSource(%r).onmessage = "
+    "function () { location.reload(); };</script>" % RELOAD_PATH
+).encode("utf-8")
+
+
+class LiveSite:
+    """A built site kept in memory and updated as files change.
+
+    If an update fails, for example on a file saved half-finished, the
+    previous site and manifest state are kept and the changed paths are
+    tried again with the next update.
+
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.manifest = Manifest(settings)
+        self.site = build_site(settings, self.manifest)
+        self.pending = set()
+        render_site(self.site, self.manifest)
+
+    def update(self, changed):
+        """Update the site for a set of changed file paths."""
+
+        changed = self.pending | set(changed)
+        self.pending = changed
+        state = self.manifest.files, self.manifest.outputs
+
+        try:
+            self._update(changed)
+        except Exception:
+            self.manifest.files, self.manifest.outputs = state
+            raise
+
+        self.pending = set()
+
+    def _update(self, changed):
+        content = os.path.join(self.settings["content"], "")
+        pages = {page.source: page for page in self.site.pages}
+
+        changed_content = [path for path in changed if path.startswith(content)]
+        modified = [path for path in changed_content if path in pages]
+        structural = any(
+            path not in pages or not os.path.isfile(path) for path in changed_content
+        )
+
+        self.manifest.rollover(carry_files=not structural)
+
+        if structural:
+            self.site = build_site(self.settings, self.manifest)
+        elif modified:
+            results = read_sources(modified, self.settings, self.manifest)
+            for source, (text, metadata) in zip(modified, results):
+                replace_page(pages[source], text, metadata)
+
+            self.site.categories = load_categories(self.site)
+
+        render_site(self.site, self.manifest)
+
+    def save(self):
+        """Persist the manifest for the next build."""
+
+        self.manifest.save()
+
+
+def watch(settings, on_update=None):
+    """Rebuild the site whenever content, templates, or static files change.
+
+    Runs until interrupted. `on_update` is called after every rebuild.
+    Errors during a rebuild are reported on stderr, whatever the
+    progress mode, and the site is left as it was until the next change.
+
+    """
+
+    live = LiveSite(settings)
+    progress = Progress(settings.get("progress"), 0)
+    paths = [settings["content"], settings.get("templates"), settings.get("static")]
+    files = watcher(paths)
+
+    print("Watching for changes, press Ctrl-C to stop.")
+
+    try:
+        while True:
+            changed = files.wait()
+            if not changed:
+                continue
+
+            start = time.perf_counter()
+            try:
+                live.update(changed)
+            except Exception as e:
+                print(f"Rebuild failed: {type(e).__name__}: {e}", file=sys.stderr)
+                continue
+
+            elapsed = (time.perf_counter() - start) * 1000
+            progress.message(
+                f"Rebuilt {len(changed)} changed file(s) in {elapsed:.0f} ms"
+            )
+
+            if on_update:
+                on_update()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        files.close()
+        live.save()
+
+
+class LiveReload:
+    """Build counter that request handlers can wait on."""
+
+    def __init__(self):
+        self.version = 0
+        self.condition = threading.Condition()
+
+    def bump(self):
+        """Signal that the site was rebuilt."""
+
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait(self, version, timeout):
+        """Wait until the version differs from `version`, return it."""
+
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+class Handler(SimpleHTTPRequestHandler):
+    """Static file handler with live reload.
+
+    Output files without an extension are served as HTML, matching
+    litesite's default URLs.
+
+    """
+
+    def __init__(self, *args, reload=None, directory=None, **kwargs):
+        self.reload = reload
+
+        ## Handlers serve the working directory before Python 3.7
+        self.directory = directory or os.getcwd()
+        if sys.version_info >= (3, 7):
+            kwargs["directory"] = self.directory
+
+        super().__init__(*args, **kwargs)
+
+    def translate_path(self, path):
+        translated = super().translate_path(path)
+        if sys.version_info >= (3, 7):
+            return translated
+
+        rel = os.path.relpath(translated, os.getcwd())
+        joined = os.path.normpath(os.path.join(self.directory, rel))
+        return joined + "/" if translated.endswith("/") else joined
+
+    def guess_type(self, path):
+        if not os.path.splitext(path)[1]:
+            return "text/html"
+
+        return super().guess_type(path)
+
+    def do_GET(self):
+        if self.path == RELOAD_PATH:
+            return self.send_reloads()
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?")[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+
+        if os.path.isfile(path) and self.guess_type(path) == "text/html":
+            return self.send_html(path)
+
+        return super().do_GET()
+
+    def send_html(self, path):
+        """Send an HTML file with the live reload script injected."""
+
+        with open(path, "rb") as f:
+            body = f.read()
+
+        end = body.rfind(b"</body>")
+        if end < 0:
+            body += RELOAD_SCRIPT
+        else:
+            body = body[:end] + RELOAD_SCRIPT + body[end:]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_reloads(self):
+        """Stream a server-sent event after every rebuild."""
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+
+        version = self.reload.version
+        try:
+            while True:
+                new = self.reload.wait(version, timeout=15)
+                if new != version:
+                    version = new
+                    self.wfile.write(b"data: reload\n\n")
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def make_server(settings, host, port, reload):
+    """Return an HTTP server for the site output directory."""
+
+    handler = functools.partial(Handler, reload=reload, directory=settings["site"])
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(settings, host="localhost", port=8000):
+    """Serve the site with live reload, rebuilding on change."""
+
+    reload = LiveReload()
+    os.makedirs(settings["site"], exist_ok=True)
+    server = make_server(settings, host, port, reload)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"Serving {settings['site']} at http://{host}:{port}/")
+
+    try:
+        watch(settings, on_update=reload.bump)
+    finally:
+        server.shutdown()
+        server.server_close()
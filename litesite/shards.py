@@ -0,0 +1,199 @@
+"""Build sharding across machines.
+
+With the `shard` setting, `[K, N]` or `--shard K/N` on the command
+line, `render_site` renders only the outputs assigned to shard K of N.
+Every shard computes the same assignment from the site graph, so the
+shards need no coordination as long as they build the same site with
+the same settings, e.g. from a shared snapshot.
+
+Outputs are placed by consistent hashing with bounded loads: each
+output prefers the shard picked by a hash of its URL, and moves on to
+the next shard if that would take the preferred one more than 10%
+over an even share of the estimated render cost. Costs are estimated
+from the source size of pages and the length of listings. Source sizes
+are taken from the snapshot if the site was loaded from one, so every
+shard computes the same plan whatever its local content files. Outputs
+are placed most expensive first, so large outputs are spread evenly.
+
+Each shard writes a manifest of its outputs to the cache directory,
+and `litesite merge` checks that a set of shard manifests covers every
+output exactly once.
+
+"""
+
+import json
+import os
+
+from litesite.content import CategoryItem, Page
+from litesite.manifest import cache_dir, digest
+
+## Allowed load over an even share of the total cost
+SLACK = 1.1
+
+## Estimated render cost of a listed page or entry, in bytes of source
+ITEM_COST = 512
+
+
+def parse_shard(value):
+    """Return (K, N) from a `K/N` string or a `[K, N]` pair."""
+
+    if isinstance(value, str):
+        value = value.split("/")
+
+    try:
+        index, count = (int(v) for v in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"shard must be K/N, got {value!r}") from None
+
+    if not 1 <= index <= count:
+        raise ValueError(f"shard {index}/{count} is out of range")
+
+    return index, count
+
+
+def source_size(page, sizes=None):
+    """Return the size of a page's source, from `sizes` if passed."""
+
+    if sizes is not None:
+        return sizes.get(page.source, 0)
+
+    try:
+        return os.path.getsize(page.source)
+    except (OSError, TypeError):
+        return 0
+
+
+def job_cost(job, sizes=None):
+    """Return the estimated render cost of a render job.
+
+    `sizes` maps page sources to their size, as recorded in a snapshot.
+
+    """
+
+    obj = job.obj
+    paginator = job.args.get("paginator")
+
+    if paginator:
+        listed = len(paginator.items)
+    elif isinstance(obj, Page):
+        listed = len(obj.section.pages) if obj.is_index else 0
+    elif isinstance(obj, CategoryItem):
+        listed = len(obj.pages)
+    else:
+        listed = len(obj.items)
+
+    size = source_size(obj, sizes) if isinstance(obj, Page) else 0
+    return 1 + size + ITEM_COST * listed
+
+
+def output_cost(output):
+    """Return the estimated cost of a feed or sitemap output."""
+
+    return 1 + ITEM_COST * len(output.entries)
+
+
+def assign(costs, count):
+    """Assign outputs to shards.
+
+    `costs` maps output URLs to estimated costs. Returns a mapping from
+    URL to shard number, from 1 to `count`.
+
+    """
+
+    if not costs:
+        return {}
+
+    capacity = max(SLACK * sum(costs.values()) / count, max(costs.values()))
+    loads = [0] * count
+    shards = {}
+
+    for url in sorted(costs, key=lambda url: (-costs[url], url)):
+        cost = costs[url]
+        preferred = int(digest(url), 16) % count
+
+        for i in range(count):
+            shard = (preferred + i) % count
+            if loads[shard] + cost <= capacity:
+                break
+        else:
+            shard = loads.index(min(loads))
+
+        loads[shard] += cost
+        shards[url] = shard + 1
+
+    return shards
+
+
+def plan_digest(shards):
+    """Return a digest of a complete output to shard assignment."""
+
+    return digest(json.dumps(sorted(shards.items())))
+
+
+def manifest_path(settings, index, count):
+    return os.path.join(cache_dir(settings), f"shard-{index}-of-{count}.json")
+
+
+def write_manifest(settings, shards, index, count):
+    """Write the manifest of the outputs of one shard. Returns its path."""
+
+    outputs = sorted(url for url, shard in shards.items() if shard == index)
+    data = {
+        "shard": index,
+        "count": count,
+        "total": len(shards),
+        "plan": plan_digest(shards),
+        "outputs": outputs,
+    }
+
+    path = manifest_path(settings, index, count)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+    return path
+
+
+def check_manifests(manifests):
+    """Check that shard manifests cover every output exactly once.
+
+    Returns a list of problems, empty if the shards are complete.
+
+    """
+
+    if not manifests:
+        return ["no shard manifests"]
+
+    errors = []
+    first = manifests[0]
+    for key in ("count", "total", "plan"):
+        if any(m[key] != first[key] for m in manifests):
+            errors.append(
+                f"shard manifests disagree on {key}, they are from different builds"
+            )
+
+    if errors:
+        return errors
+
+    numbers = sorted(m["shard"] for m in manifests)
+    expected = list(range(1, first["count"] + 1))
+    for number in sorted(set(expected) - set(numbers)):
+        errors.append(f"shard {number}/{first['count']} is missing")
+    for number in sorted({n for n in numbers if numbers.count(n) > 1}):
+        errors.append(f"shard {number}/{first['count']} is given more than once")
+
+    shards = {}
+    for m in manifests:
+        for url in m["outputs"]:
+            if url in shards and shards[url] != m["shard"]:
+                errors.append(
+                    f"{url} is written by shards {shards[url]} and {m['shard']}"
+                )
+            shards[url] = m["shard"]
+
+    if not errors and (
+        len(shards) != first["total"] or plan_digest(shards) != first["plan"]
+    ):
+        errors.append(f"shards write {len(shards)} outputs, expected {first['total']}")
+
+    return errors
@@ -0,0 +1,103 @@
+"""Site graph snapshots.
+
+A snapshot is the fully built site graph, with converted page content,
+pickled to a file. Sharded builds on several machines can load the
+same snapshot with the `snapshot` setting, or `--snapshot FILE`, so
+only the machine writing it converts markdown. `litesite snapshot
+config.yaml -o site.pickle` writes one.
+
+"""
+
+import json
+import os
+import pickle
+
+from litesite.manifest import Manifest, digest
+from litesite.stats import stats
+
+VERSION = 2
+
+## Settings which don't change the site graph
+IGNORED_KEYS = Manifest.runtime_keys | {"stream"}
+
+
+def settings_digest(settings):
+    """Return a digest of the settings a snapshot was built with."""
+
+    relevant = {k: v for k, v in settings.items() if k not in IGNORED_KEYS}
+    return digest(json.dumps(relevant, sort_keys=True, default=str))
+
+
+def write_snapshot(settings, path):
+    """Build the site and write a snapshot of it to `path`.
+
+    Page content is always converted, even if `stream` is set, so
+    loading the snapshot needs no conversion. Returns the site.
+
+    """
+
+    from litesite.builder import build_site
+
+    settings = dict(settings, stream=False)
+    settings.pop("snapshot", None)
+
+    manifest = Manifest(settings)
+    site = build_site(settings, manifest)
+
+    with stats.timer("snapshot"):
+        ## Store rendered URLs so loading shards don't render them again,
+        ## and source sizes so every shard estimates the same costs
+        site.source_sizes = {}
+        for page in site.pages:
+            page.url
+            site.source_sizes[page.source] = os.path.getsize(page.source)
+
+        data = {
+            "version": VERSION,
+            "settings": settings_digest(settings),
+            "site": site,
+            "files": {source: entry["sha"] for source, entry in manifest.files.items()},
+        }
+
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    return site
+
+
+def load_snapshot(path, settings, manifest=None):
+    """Return the site graph stored in a snapshot.
+
+    Raises ValueError if the snapshot was written by another version or
+    with different settings. If a `manifest` is passed, the content
+    hash of every page is recorded in it for incremental rendering.
+
+    """
+
+    with stats.timer("snapshot"):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+
+    if not isinstance(data, dict) or data.get("version") != VERSION:
+        raise ValueError(f"{path} is not a snapshot of this litesite version")
+
+    if data["settings"] != settings_digest(settings):
+        raise ValueError(f"{path} was built with different settings")
+
+    site = data["site"]
+    site.settings = settings
+
+    if manifest:
+        for page in site.pages:
+            sha = data["files"].get(page.source)
+            if sha:
+                manifest.files[page.source] = {
+                    "fingerprint": None,
+                    "sha": sha,
+                    "content": page.content,
+                    "metadata": page.metadata,
+                }
+
+    return site
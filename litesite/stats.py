@@ -0,0 +1,185 @@
+"""Build instrumentation.
+
+The module level `stats` object records wall time and call counts for
+build phases and templates, and the slowest rendered outputs. It is
+disabled by default, in which case timers are shared no-op objects.
+
+Worker processes record into their own copy, which is sent back to
+the main process with `drain` and combined with `merge`.
+
+"""
+
+import functools
+import heapq
+import json
+import time
+
+
+class Timer:
+    """Context manager adding elapsed time to a stats table entry."""
+
+    __slots__ = ("table", "key", "start")
+
+    def __init__(self, table, key):
+        self.table = table
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        entry = self.table.get(self.key)
+        if entry is None:
+            entry = self.table[self.key] = [0.0, 0]
+
+        entry[0] += time.perf_counter() - self.start
+        entry[1] += 1
+
+
+class NullTimer:
+    """Timer used while stats are disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class Stats:
+    """Wall time and call counts per phase, template, and output."""
+
+    def __init__(self, slowest=20):
+        self.enabled = False
+        self.slowest = slowest
+        self.reset()
+
+    def reset(self):
+        """Clear all recorded data."""
+
+        self.phases = {}
+        self.templates = {}
+        self.pages = []
+
+    def enable(self):
+        """Start recording, including time spent in Pygments."""
+
+        self.enabled = True
+        instrument_highlight()
+
+    def timer(self, phase):
+        """Return a context manager timing a build phase."""
+
+        if not self.enabled:
+            return NULL_TIMER
+
+        return Timer(self.phases, phase)
+
+    def template(self, name):
+        """Return a context manager timing a template render."""
+
+        if not self.enabled:
+            return NULL_TIMER
+
+        return Timer(self.templates, name)
+
+    def page(self, name, seconds):
+        """Record the time taken to render an output."""
+
+        entry = (seconds, name)
+        if len(self.pages) < self.slowest:
+            heapq.heappush(self.pages, entry)
+        else:
+            heapq.heappushpop(self.pages, entry)
+
+    def drain(self):
+        """Return the recorded data and reset, for sending to another process."""
+
+        data = (self.phases, self.templates, self.pages)
+        self.reset()
+
+        return data
+
+    def merge(self, data):
+        """Add data drained from another process."""
+
+        phases, templates, pages = data
+
+        for table, other in ((self.phases, phases), (self.templates, templates)):
+            for key, (seconds, count) in other.items():
+                entry = table.setdefault(key, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += count
+
+        for seconds, name in pages:
+            self.page(name, seconds)
+
+    def as_dict(self):
+        """Return the recorded data in a JSON serializable form."""
+
+        table = lambda t: {
+            key: {"seconds": round(seconds, 6), "calls": count}
+            for key, (seconds, count) in sorted(t.items(), key=lambda i: -i[1][0])
+        }
+
+        return {
+            "phases": table(self.phases),
+            "templates": table(self.templates),
+            "slowest": [
+                {"name": name, "seconds": round(seconds, 6)}
+                for seconds, name in sorted(self.pages, reverse=True)
+            ],
+        }
+
+    def dump(self, path):
+        """Write the recorded data as JSON."""
+
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def summary(self):
+        """Return a plain text summary table."""
+
+        data = self.as_dict()
+        lines = []
+
+        for title, key in (("phase", "phases"), ("template", "templates")):
+            lines.append(f"{title:<40} {'seconds':>10} {'calls':>8}")
+            for name, entry in data[key].items():
+                lines.append(
+                    f"{name:<40} {entry['seconds']:>10.4f} {entry['calls']:>8}"
+                )
+            lines.append("")
+
+        lines.append(f"{'slowest output':<40} {'seconds':>10}")
+        for entry in data["slowest"]:
+            lines.append(f"{entry['name']:<40} {entry['seconds']:>10.4f}")
+
+        return "\n".join(lines)
+
+
+stats = Stats()
+
+
+def instrument_highlight():
+    """Time Pygments highlighting done by the codehilite extension."""
+
+    from markdown.extensions import codehilite
+
+    highlight = getattr(codehilite, "highlight", None)
+    if highlight is None or getattr(highlight, "instrumented", False):
+        return
+
+    @functools.wraps(highlight)
+    def timed(*args, **kwargs):
+        with stats.timer("pygments"):
+            return highlight(*args, **kwargs)
+
+    timed.instrumented = True
+    codehilite.highlight = timed
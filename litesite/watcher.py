@@ -0,0 +1,185 @@
+"""File system watchers for rebuilding on change.
+
+On Linux, changes are reported by inotify through ctypes. Elsewhere,
+or if inotify is unavailable, directories are polled for changed
+modification times. Hidden files and editor backups are ignored.
+
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+## inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+)
+
+EVENT = struct.Struct("iIII")
+
+## Time to wait for more changes after the first, in seconds
+DEBOUNCE = 0.05
+
+
+def ignored(name):
+    """Return True for hidden files and editor backups."""
+
+    return name.startswith(".") or name.endswith("~")
+
+
+def walk_dirs(paths):
+    """Yield every directory under `paths`."""
+
+    for top in paths:
+        for path, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if not ignored(d)]
+            yield path
+
+
+class InotifyWatcher:
+    """Watch directory trees for changes with inotify."""
+
+    def __init__(self, paths):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.libc = libc
+
+        self.fd = libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init failed")
+
+        self.dirs = {}
+        for path in walk_dirs(paths):
+            self.add(path)
+
+    def add(self, path):
+        """Watch a directory."""
+
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = path
+
+    def read(self, timeout):
+        """Return paths changed in events read within `timeout` seconds."""
+
+        changed = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changed
+
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if wd not in self.dirs or not name:
+                continue
+
+            name = os.fsdecode(name)
+            if ignored(name):
+                continue
+
+            path = os.path.join(self.dirs[wd], name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    for new in walk_dirs([path]):
+                        self.add(new)
+                continue
+
+            changed.add(path)
+
+        return changed
+
+    def wait(self, timeout=None):
+        """Block until files change, then return the changed paths."""
+
+        changed = self.read(timeout)
+        while changed:
+            more = self.read(DEBOUNCE)
+            if not more:
+                break
+            changed |= more
+
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Watch directory trees for changes by polling modification times."""
+
+    interval = 0.2
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.state = self.scan()
+
+    def scan(self):
+        """Return a (mtime, size) fingerprint for every watched file."""
+
+        state = {}
+        for path in walk_dirs(self.paths):
+            for name in os.listdir(path):
+                full = os.path.join(path, name)
+                if ignored(name) or not os.path.isfile(full):
+                    continue
+                try:
+                    stat = os.stat(full)
+                except OSError:
+                    continue
+                state[full] = (stat.st_mtime_ns, stat.st_size)
+
+        return state
+
+    def wait(self, timeout=None):
+        """Block until files change, then return the changed paths."""
+
+        start = time.monotonic()
+        while timeout is None or time.monotonic() - start < timeout:
+            time.sleep(self.interval)
+            state = self.scan()
+            if state != self.state:
+                old, self.state = self.state, state
+                keys = old.keys() | state.keys()
+                return {path for path in keys if old.get(path) != state.get(path)}
+
+        return set()
+
+    def close(self):
+        pass
+
+
+def watcher(paths):
+    """Return the best available watcher for `paths`."""
+
+    paths = [path for path in paths if path and os.path.isdir(path)]
+
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass
+
+    return PollingWatcher(paths)
@@ -0,0 +1,105 @@
+"""Output file writers.
+
+Outputs are only written when their content changed, so unchanged
+files keep their modification time for rsync and CDN uploads. Files
+are written to a temporary file and renamed into place, so a partial
+build never leaves truncated files behind.
+
+"""
+
+import filecmp
+import os
+import threading
+
+from litesite.stats import stats
+
+
+class Writer:
+    """Write output files atomically, skipping unchanged ones."""
+
+    def __init__(self):
+        self.dirs = set()
+        self.written = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def write(self, out, text):
+        """Write text to `out` and return True, or False if unchanged."""
+
+        with stats.timer("write"):
+            data = text.encode("utf-8")
+
+            if self.unchanged(out, data):
+                with self.lock:
+                    self.skipped += 1
+                return False
+
+            directory = os.path.dirname(out)
+            if directory not in self.dirs:
+                os.makedirs(directory, exist_ok=True)
+                self.dirs.add(directory)
+
+            tmp = f"{out}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, out)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+
+            with self.lock:
+                self.written += 1
+            return True
+
+    def write_chunks(self, out, chunks):
+        """Stream text chunks to `out` and return True, or False if unchanged.
+
+        Chunks are written to the temporary file as they are produced,
+        so large outputs are never held in memory. The temporary file
+        is discarded if it matches the existing output.
+
+        """
+
+        with stats.timer("write"):
+            directory = os.path.dirname(out)
+            if directory not in self.dirs:
+                os.makedirs(directory, exist_ok=True)
+                self.dirs.add(directory)
+
+            tmp = f"{out}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+
+                if os.path.exists(out) and filecmp.cmp(tmp, out, shallow=False):
+                    os.remove(tmp)
+                    with self.lock:
+                        self.skipped += 1
+                    return False
+
+                os.replace(tmp, out)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+
+            with self.lock:
+                self.written += 1
+            return True
+
+    @staticmethod
+    def unchanged(out, data):
+        """Return True if `out` already contains `data`."""
+
+        try:
+            if os.path.getsize(out) != len(data):
+                return False
+
+            with open(out, "rb") as f:
+                return f.read() == data
+
+        except OSError:
+            return False
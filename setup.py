@@ -1,8 +1,6 @@
 from setuptools import setup, find_packages
 
 requires = [
-    "beautifulsoup4",
-    "cached-property",
     "Jinja2",
     "markdown-full-yaml-metadata",
     "Markdown",
@@ -17,5 +15,7 @@ setup(
     version="1.0",
     packages=find_packages(),
     entry_points={"console_scripts": "litesite = litesite.cli:main"},
+    python_requires=">=3.6",
     install_requires=requires,
+    extras_require={"images": ["Pillow"]},
 )
@@ -16,6 +16,15 @@ def settings(shared_datadir):
     }
 
 
+@pytest.fixture
+def render_settings(settings, shared_datadir):
+    return dict(
+        settings,
+        templates=os.path.join(shared_datadir, "templates"),
+        cache_dir=os.path.join(shared_datadir, "cache"),
+    )
+
+
 @pytest.fixture
 def renderer(shared_datadir):
     settings = {"templates": f"{shared_datadir}/templates"}
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+from litesite.assets import copy_assets
+from litesite.content import Site
+from litesite.renderers import Renderer
+
+
+@pytest.fixture
+def asset_settings(tmp_path):
+    static = tmp_path / "static"
+    (static / "css").mkdir(parents=True)
+    (static / "css" / "style.css").write_text("body {}")
+    (static / "img.png").write_bytes(b"\x89PNG")
+
+    return {"static": str(static), "site": str(tmp_path / "site")}
+
+
+class TestAssets:
+    def test_mirrored(self, asset_settings):
+        assets, written = copy_assets(asset_settings)
+        out = os.path.join(asset_settings["site"], "img.png")
+
+        assert written == 2
+        assert assets["img.png"] == "img.png"
+        with open(out, "rb") as f:
+            assert f.read() == b"\x89PNG"
+
+    def test_unchanged_not_copied(self, asset_settings):
+        copy_assets(asset_settings)
+
+        assert copy_assets(asset_settings)[1] == 0
+
+    def test_hardlink(self, asset_settings):
+        copy_assets(dict(asset_settings, static_link=True))
+        src = os.path.join(asset_settings["static"], "img.png")
+
+        assert os.path.samefile(src, os.path.join(asset_settings["site"], "img.png"))
+
+    def test_fingerprint(self, asset_settings):
+        settings = dict(asset_settings, fingerprint=True)
+        assets, _ = copy_assets(settings)
+        out = assets["css/style.css"]
+
+        assert out.startswith("css/style.") and out.endswith(".css")
+        assert os.path.exists(os.path.join(settings["site"], out))
+
+        with open(os.path.join(settings["site"], "assets.json")) as f:
+            assert json.load(f) == assets
+
+    def test_stale_outputs_removed(self, asset_settings):
+        settings = dict(asset_settings, fingerprint=True)
+        old = copy_assets(settings)[0]["css/style.css"]
+
+        with open(os.path.join(settings["static"], "css/style.css"), "w") as f:
+            f.write("body { color: red }")
+        os.remove(os.path.join(settings["static"], "img.png"))
+        new = copy_assets(settings)[0]["css/style.css"]
+
+        assert new != old
+        assert not os.path.exists(os.path.join(settings["site"], old))
+        assert not os.path.exists(os.path.join(settings["site"], "img.png"))
+
+    def test_filter(self, asset_settings):
+        site = Site(asset_settings)
+        site.assets = {"css/style.css": "css/style.0123abcd.css"}
+        string = "{{ '/css/style.css'|asset }} {{ 'other.js'|asset }}"
+        text = Renderer.render_from_string(string, {"site": site})
+
+        assert text == "/css/style.0123abcd.css other.js"
@@ -1,4 +1,13 @@
+import json
+import os
+
 import pytest
+import yaml
+
+from litesite.builder import build_site, render_site, scan_site
+from litesite.content import Paginator, page_size, paged_url
+from litesite.graph import default, site_graph
+from litesite.readers import Reader, read_front_matter, read_metadata
 
 
 class TestBuild:
@@ -41,3 +50,278 @@ class TestCategories:
     def test_duplicate_values(self, category):
         vals = [item.value for item in category.items]
         assert len(set(vals)) == len(vals)
+
+
+class TestParallelLoad:
+    def test_same_tree_as_serial(self, settings):
+        serial = build_site(settings)
+        parallel = build_site(dict(settings, workers=2))
+
+        def tree(site):
+            return [
+                (
+                    section.rel,
+                    [(p.name, p.content, p.metadata) for p in section.all_pages],
+                )
+                for section in site.sections
+            ]
+
+        assert tree(parallel) == tree(serial)
+
+
+def read_tree(root):
+    tree = {}
+    for path, dirs, files in os.walk(root):
+        for name in files:
+            with open(os.path.join(path, name), "rb") as f:
+                tree[os.path.relpath(os.path.join(path, name), root)] = f.read()
+
+    return tree
+
+
+class TestRender:
+    def test_parallel_matches_serial(self, render_settings, tmp_path):
+        serial = dict(render_settings, site=str(tmp_path / "serial"))
+        parallel = dict(render_settings, site=str(tmp_path / "parallel"), workers=3)
+
+        render_site(build_site(serial))
+        render_site(build_site(parallel))
+
+        assert read_tree(parallel["site"]) == read_tree(serial["site"])
+
+    def test_quiet(self, render_settings, capsys):
+        render_site(build_site(dict(render_settings, progress="quiet")))
+        captured = capsys.readouterr()
+
+        assert captured.out == captured.err == ""
+
+    def test_progress_bar(self, render_settings, capsys):
+        render_site(build_site(dict(render_settings, progress="bar")))
+        captured = capsys.readouterr()
+
+        assert captured.out == ""
+        done, total = captured.err.split()[-1].split("/")
+        assert done == total
+
+
+class TestCategoryIndex:
+    def test_item_pages(self, category):
+        pages = {
+            item.value: {page.name for page in item.pages} for item in category.items
+        }
+        both = {"a_page", "b_page"}
+
+        assert pages == {"a": {"a_page"}, "b": both, "c": both, "d": {"b_page"}}
+
+    def test_counts(self, category):
+        counts = {item.value: item.count for item in category.items}
+
+        assert counts == {"a": 1, "b": 2, "c": 2, "d": 1}
+
+    def test_sorted(self, category):
+        assert [item.value for item in category.sorted] == ["b", "c", "a", "d"]
+
+
+class TestPagination:
+    @pytest.fixture
+    def paged(self, render_settings):
+        settings = dict(render_settings, paginate={"tags": 3, "tag": 1, "dogs": 1})
+        render_site(build_site(dict(settings, progress="quiet")))
+
+        return read_tree(settings["site"])
+
+    def test_paged_url(self):
+        assert paged_url("tags/index.html", 1) == "tags/index.html"
+        assert paged_url("tags/index.html", 2) == "tags/page/2/index.html"
+
+    def test_category_pages(self, paged):
+        assert paged["tags/index.html"] == b"b 2\nc 2\na 1\n"
+        assert paged["tags/page/2/index.html"] == b"d 1\n"
+
+    def test_item_pages(self, paged):
+        assert paged["tags/b"] == b"a_page\n"
+        assert paged["tags/page/2/b"] == b"b_page\n"
+        assert "tags/page/2/a" not in paged
+
+    def test_section_pages(self, paged):
+        pages = [url for url in paged if url.startswith("animals/dogs/page/")]
+
+        assert sorted(pages) == [
+            "animals/dogs/page/2/index",
+            "animals/dogs/page/3/index",
+        ]
+
+    def test_namespaced_keys(self, render_settings, paged, tmp_path):
+        paginate = {"section:dogs": 1, "category:tags": 3, "item:tag": 1}
+        settings = dict(render_settings, site=str(tmp_path / "ns"), paginate=paginate)
+        render_site(build_site(dict(settings, progress="quiet")))
+
+        assert read_tree(settings["site"]) == paged
+
+    def test_page_size(self):
+        settings = {"paginate": {"tags": 2, "category:tags": 5}}
+
+        assert page_size(settings, "category", "tags") == 5
+        assert page_size(settings, "section", "tags") == 2
+        assert page_size(settings, "item", "tag") is None
+        assert page_size({}, "section", "tags") is None
+
+    def test_paginator(self):
+        paginator = Paginator(list(range(5)), 2, 3, "tags/index.html")
+
+        assert paginator.items == [4]
+        assert paginator.count == 3
+        assert not paginator.has_next
+        assert paginator.prev_url == "tags/page/2/index.html"
+
+
+class TestStreaming:
+    def test_metadata_matches_reader(self, settings):
+        reader = Reader()
+        for path, dirs, files in os.walk(settings["content"]):
+            for name in files:
+                with open(os.path.join(path, name)) as f:
+                    text = f.read()
+
+                assert read_metadata(text) == reader.read(text)[1]
+
+    def test_content_loaded_on_demand(self, settings):
+        site = build_site(dict(settings, stream=True))
+        expected = {p.source: p.content for p in build_site(settings).pages}
+
+        for page in site.pages:
+            assert page._content is None
+            assert page.content == expected[page.source]
+
+    def test_content_cache_bounded(self, settings):
+        site = build_site(dict(settings, stream=True, stream_cache=2))
+        pages = list(site.pages)
+
+        for page in pages:
+            page.content
+
+        assert len(pages[0].loader.loaded) == 2
+
+    def test_render_matches(self, render_settings, tmp_path):
+        full = dict(render_settings, site=str(tmp_path / "full"))
+        stream = dict(render_settings, site=str(tmp_path / "stream"), stream=True)
+
+        render_site(build_site(full))
+        site = build_site(stream)
+        render_site(site)
+
+        assert read_tree(stream["site"]) == read_tree(full["site"])
+        assert not next(site.pages).loader.loaded
+
+
+class TestFrontMatter:
+    def test_matches_reader(self, settings):
+        reader = Reader()
+        for path, dirs, files in os.walk(settings["content"]):
+            for name in files:
+                source = os.path.join(path, name)
+                with open(source) as f:
+                    expected = reader.read(f.read())[1]
+
+                assert read_front_matter(source) == expected
+
+    def test_body_not_read(self, tmp_path):
+        source = tmp_path / "page.md"
+        source.write_text("---\ntitle: a\n---\n" + "x" * 10**6)
+
+        assert read_front_matter(str(source)) == {"title": "a"}
+
+    @pytest.mark.parametrize(
+        "text, expected",
+        [
+            ("Just text.\n", {}),
+            ("", {}),
+            ("---\n---\nEmpty block.\n", {}),
+            ("\n---\ntitle: a\n---\nBody.\n", {"title": "a"}),
+            ("\r\n---\r\ntitle: a\r\n---\r\nBody.\r\n", {"title": "a"}),
+            ("\n\n---\ntitle: a\n---\nBody.\n", {}),
+            ("  \n---\ntitle: a\n---\nBody.\n", {}),
+            ("---  \ntitle: a\n---\nBody.\n", {}),
+        ],
+    )
+    def test_matches_reader_edge_cases(self, tmp_path, text, expected):
+        source = tmp_path / "page.md"
+        source.write_bytes(text.encode("utf-8"))
+
+        assert read_front_matter(str(source)) == expected
+        assert read_metadata(text) == expected
+        assert Reader().read(text)[1] == expected
+
+    def test_leading_blank_line(self, settings):
+        source = os.path.join(settings["content"], "blank.md")
+        with open(source, "w") as f:
+            f.write("\n---\ntitle: Blank\nslug: blank\n---\nBody.\n")
+
+        page = next(p for p in build_site(settings).pages if p.source == source)
+
+        assert page.metadata["title"] == "Blank"
+        assert page.content == "<p>Body.</p>"
+
+    def test_no_front_matter(self, settings):
+        source = os.path.join(settings["content"], "plain.md")
+        with open(source, "w") as f:
+            f.write("Body.\n")
+
+        page = next(p for p in build_site(settings).pages if p.source == source)
+
+        assert page.metadata == {}
+        assert page.content == "<p>Body.</p>"
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "---\ntitle: a\n---\n\nBody *text*.\n",
+            "---\r\ntitle: a\r\n...\r\n---\r\n\nAfter a rule.\r\n",
+            "No metadata.\n\n---\n",
+            "---\ntitle: unclosed\n",
+            "---\ntitle: only\n---\n",
+            "\n---\ntitle: a\n---\nBody.\n",
+            "\n\n---\ntitle: a\n---\nBody.\n",
+            "Body.\n",
+        ],
+    )
+    def test_body_matches_reader(self, text):
+        reader = Reader()
+
+        assert reader.read_body(text) == reader.read(text)[0]
+
+    def test_metadata_parsed_once(self, settings, monkeypatch):
+        calls = []
+        load = yaml.load
+
+        def counted(*args, **kwargs):
+            calls.append(1)
+            return load(*args, **kwargs)
+
+        monkeypatch.setattr(yaml, "load", counted)
+        site = build_site(settings)
+
+        assert len(calls) == len(list(site.pages))
+        assert all(page.content is not None for page in site.pages)
+
+    def test_scan_has_no_content(self, settings):
+        site = scan_site(settings)
+
+        assert all(page.content is None for page in site.pages)
+        assert [c.name for c in site.categories] == ["tags"]
+
+    def test_graph(self, settings):
+        data = json.loads(json.dumps(site_graph(scan_site(settings)), default=default))
+        pages = {page["name"]: page for page in data["pages"]}
+
+        assert pages["top_level_page"]["url"] == "./top"
+        assert pages["borzoi"]["metadata"]["date"] == "2013-01-01"
+        assert {item["value"] for item in data["categories"][0]["items"]} == set("abcd")
+
+
+class TestUnchangedWrites:
+    def test_second_render_writes_nothing(self, render_settings):
+        settings = dict(render_settings, progress="quiet")
+
+        assert render_site(build_site(settings))
+        assert render_site(build_site(settings)) == []
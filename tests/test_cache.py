@@ -0,0 +1,136 @@
+import os
+import sys
+
+import markdown
+import pygments
+import pytest
+from markdown.extensions import codehilite
+
+from litesite.builder import build_site, render_site
+from litesite.cache import Cache, clear_caches
+from litesite.readers import Reader, dependency_versions
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return Cache(str(tmp_path / "cache"))
+
+
+class TestCache:
+    def test_get_set(self, cache):
+        cache.set("abcdef", ("text", {"a": 1}))
+
+        assert cache.get("abcdef") == ("text", {"a": 1})
+
+    def test_missing(self, cache):
+        assert cache.get("abcdef") is None
+
+    def test_clear(self, cache):
+        cache.set("abcdef", "text")
+        cache.clear()
+
+        assert cache.get("abcdef") is None
+
+    def test_clear_caches(self, render_settings):
+        settings = dict(render_settings, cache=True, progress="quiet")
+        render_site(build_site(settings))
+        directory = settings["cache_dir"]
+        assert os.listdir(os.path.join(directory, "markdown"))
+        assert os.listdir(os.path.join(directory, "templates"))
+
+        clear_caches(settings)
+
+        for name in ("markdown", "highlight", "templates", "images"):
+            assert not os.path.exists(os.path.join(directory, name))
+
+    def test_eviction(self, tmp_path):
+        cache = Cache(str(tmp_path / "cache"), max_size=1)
+        cache.set("old", b"x" * 400000)
+        os.utime(cache.path("old"), (0, 0))
+        cache.set("new", b"x" * 400000)
+        cache.set("newer", b"x" * 400000)
+
+        assert cache.get("old") is None
+        assert cache.get("newer") is not None
+
+
+class TestReaderCache:
+    def test_dependency_versions_without_metadata(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, "importlib.metadata", None)
+        versions = dependency_versions.__wrapped__()
+
+        assert versions["Markdown"] == markdown.__version__
+        assert versions["Pygments"] == pygments.__version__
+
+    def test_cache_hit_skips_conversion(self, cache, monkeypatch):
+        text = "---\ntitle: a\n---\n\nSome *text*."
+        expected = Reader(cache=cache).read(text)
+
+        reader = Reader(cache=cache)
+        monkeypatch.setattr(reader.md, "convert", None)
+
+        assert reader.read(text) == expected
+
+    def test_key_depends_on_extensions(self, cache):
+        text = "Some text."
+        plain = Reader(cache=cache)
+        extended = Reader(user_extensions=["markdown.extensions.toc"], cache=cache)
+
+        assert plain.key(text) != extended.key(text)
+
+    def test_cached_build_matches(self, settings, shared_datadir):
+        cached = dict(settings, cache=True, cache_dir=str(shared_datadir / "cache"))
+        build_site(cached)
+
+        expected = [(p.content, p.metadata) for p in build_site(settings).pages]
+        actual = [(p.content, p.metadata) for p in build_site(cached).pages]
+
+        assert actual == expected
+
+
+class TestHighlightCache:
+    SNIPPET = "```python\nprint('hello')\n```\n"
+
+    def test_matches_uncached(self):
+        text = f"Some text.\n\n{self.SNIPPET}\n    :::python\n    x = 1\n"
+        reader = Reader()
+        content, _ = reader.read(text)
+        cached, _ = reader.read(text)
+
+        plain = markdown.Markdown(
+            extensions=["markdown.extensions.extra", "markdown.extensions.codehilite"]
+        )
+
+        assert content == cached == plain.convert(text)
+        assert 'class="codehilite"' in content
+
+    def test_shared_blocks_highlighted_once(self, monkeypatch):
+        reader = Reader()
+        first, _ = reader.read("First page.\n\n" + self.SNIPPET)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("highlighted again")
+
+        monkeypatch.setattr(codehilite, "highlight", fail)
+        second, _ = reader.read("Second page.\n\n" + self.SNIPPET)
+
+        assert first.split("</p>")[1] == second.split("</p>")[1]
+
+    def test_store(self, cache, monkeypatch):
+        first, _ = Reader(highlight_cache=cache).read(self.SNIPPET)
+
+        monkeypatch.setattr(codehilite, "highlight", None)
+        second, _ = Reader(highlight_cache=cache).read(self.SNIPPET)
+
+        assert first == second
+
+    def test_scoped_to_reader(self, monkeypatch):
+        Reader().read(self.SNIPPET)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("highlighted again")
+
+        monkeypatch.setattr(codehilite, "highlight", fail)
+
+        with pytest.raises(AssertionError):
+            Reader().read(self.SNIPPET)
@@ -0,0 +1,74 @@
+import gzip
+import os
+
+import pytest
+
+from litesite.builder import build_site, render_site
+from litesite.compress import compress_site, formats, gzip_compress
+from litesite.manifest import Manifest
+
+
+@pytest.fixture
+def compress_settings(render_settings):
+    return dict(render_settings, compress=["gzip"], progress="quiet")
+
+
+class TestCompress:
+    def test_siblings_written(self, compress_settings):
+        render_site(build_site(compress_settings))
+        out = os.path.join(compress_settings["site"], "tags/index.html")
+
+        with open(out, "rb") as f, gzip.open(out + ".gz") as g:
+            assert g.read() == f.read()
+
+    def test_reproducible(self):
+        assert gzip_compress(b"text") == gzip_compress(b"text")
+
+    def test_formats(self):
+        assert formats("gzip") == [".gz"]
+        assert formats(["gzip"]) == [".gz"]
+
+        with pytest.raises(ValueError):
+            formats("zip")
+
+    @pytest.mark.parametrize("setting", [1, 1.5, {"gzip": True}])
+    def test_invalid_setting(self, compress_settings, setting):
+        with pytest.raises(ValueError, match="compress must be"):
+            formats(setting)
+
+        settings = dict(compress_settings, compress=setting)
+        with pytest.raises(ValueError, match="compress must be"):
+            render_site(build_site(settings))
+
+        assert not os.path.exists(os.path.join(settings["site"], "top"))
+
+    def test_unchanged_not_recompressed(self, compress_settings):
+        render_site(build_site(compress_settings))
+
+        assert compress_site(compress_settings) == 0
+
+    def test_changed_recompressed(self, compress_settings):
+        render_site(build_site(compress_settings))
+
+        source = os.path.join(compress_settings["content"], "top_level_page.md")
+        with open(source, "a") as f:
+            f.write("\nChanged.\n")
+
+        render_site(build_site(compress_settings))
+        out = os.path.join(compress_settings["site"], "top")
+
+        with gzip.open(out + ".gz") as g:
+            assert b"Changed." in g.read()
+
+    def test_removed_output_siblings_pruned(self, compress_settings):
+        for _ in range(2):
+            manifest = Manifest(compress_settings)
+            render_site(build_site(compress_settings, manifest), manifest)
+            manifest.save()
+
+            source = os.path.join(compress_settings["content"], "posts/post.md")
+            if os.path.exists(source):
+                os.remove(source)
+
+        out = os.path.join(compress_settings["site"], "posts/test_post")
+        assert not os.path.exists(out + ".gz")
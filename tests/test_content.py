@@ -1,6 +1,10 @@
+import datetime
+
 from dateutil.parser import parse
 import pytest
 
+from litesite.content import PAGE_TEMPLATES, Page, parse_date
+
 
 class TestSection:
     def test_sorted(self, section):
@@ -68,3 +72,63 @@ class TestPage:
 
         for key, item in expected.items():
             assert page.metadata[key] == item
+
+
+class TestSortedCache:
+    def test_sorted_cached(self, section):
+        assert section.sorted is section.sorted
+
+    def test_added_page_invalidates(self, section):
+        before = section.sorted
+        extra = Page(
+            "extra", "", {"title": "Zzz", "date": datetime.date(2020, 1, 1)}, section
+        )
+        section.pages.append(extra)
+
+        assert section.sorted[:-1] == before
+        assert section.sorted[-1] is extra
+        assert section.sorted[-2].next is extra
+        assert extra.next is None
+
+    def test_index_page_not_positioned(self, section):
+        with pytest.raises(ValueError):
+            section.index.next
+
+
+class TestCompactPage:
+    @pytest.mark.parametrize(
+        "value",
+        [
+            "2013-04-15",
+            "2013-04-15 10:30",
+            "2013-04-15T10:30:00+02:00",
+            "2013-04-15 00:00:00 -0000",
+            "April 15, 2013",
+        ],
+    )
+    def test_parse_date_matches_dateutil(self, value):
+        assert parse_date(value) == parse(value)
+
+    def test_parse_date_keeps_dates(self):
+        date = datetime.date(2013, 4, 15)
+
+        assert parse_date(date) is date
+
+    def test_slots(self, page, section, category):
+        for obj in (page, section, category, category.items[0]):
+            assert not hasattr(obj, "__dict__")
+
+    def test_shared_templates(self, site):
+        pages = [page for page in site.pages if "template" not in page.metadata]
+
+        assert all(page.templates is PAGE_TEMPLATES for page in pages)
+
+    def test_interned_keys(self, site):
+        a, b = [page for page in site.pages if "title" in page.metadata][:2]
+        key_a = next(k for k in a.metadata if k == "title")
+        key_b = next(k for k in b.metadata if k == "title")
+
+        assert key_a is key_b
+
+    def test_sort_key(self, page):
+        assert page.sort_key == (page.metadata["date"], "Top Level Page")
@@ -0,0 +1,113 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from litesite.builder import build_site, render_site
+from litesite.feeds import page_date, recent
+from litesite.manifest import Manifest
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+SITEMAP = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+@pytest.fixture
+def feed_settings(render_settings):
+    return dict(
+        render_settings,
+        base_url="https://www.example.org/",
+        title="Test",
+        feeds={"formats": ["atom", "rss"], "limit": 2},
+        sitemap=True,
+        progress="quiet",
+    )
+
+
+def parse(settings, url):
+    return ET.parse(os.path.join(settings["site"], url)).getroot()
+
+
+class TestFeeds:
+    def test_recent(self, site):
+        pages = list(site.pages)
+        dated = [page for page in pages if page.metadata.get("date")]
+        expected = sorted(dated, key=page_date, reverse=True)
+
+        assert recent(pages, 3) == expected[:3]
+
+    def test_site_feed_capped(self, feed_settings):
+        render_site(build_site(feed_settings))
+        feed = parse(feed_settings, "atom.xml")
+
+        entries = feed.findall(f"{ATOM}entry")
+        assert len(entries) == 2
+        assert entries[0].find(f"{ATOM}id").text.startswith("https://www.example.org/")
+
+    def test_rss(self, feed_settings):
+        render_site(build_site(feed_settings))
+        rss = parse(feed_settings, "rss.xml")
+
+        assert len(rss.findall("channel/item")) == 2
+
+    def test_section_feed(self, feed_settings):
+        render_site(build_site(feed_settings))
+        section = parse(feed_settings, "animals/dogs/atom.xml")
+        titles = [e.find(f"{ATOM}title").text for e in section.findall(f"{ATOM}entry")]
+
+        assert titles == ["Borzoi the second", "Samoyed"]
+
+    def test_item_feed(self, feed_settings):
+        text = "---\ntitle: Dated\nslug: dated\ndate: 2020-01-01\ntags: [a]\n---\n"
+        source = os.path.join(feed_settings["content"], "categories/dated.md")
+        with open(source, "w") as f:
+            f.write(text + "\n![](img.png)\n")
+
+        render_site(build_site(feed_settings))
+        item = parse(feed_settings, "tags/a.atom.xml")
+        content = item.find(f"{ATOM}entry/{ATOM}content").text
+
+        assert 'src="https://www.example.org/categories/img.png"' in content
+
+    def test_undated_feeds_skipped(self, feed_settings):
+        render_site(build_site(feed_settings))
+
+        assert not os.path.exists(os.path.join(feed_settings["site"], "posts/atom.xml"))
+
+
+class TestSitemap:
+    @pytest.mark.parametrize("paginate", [None, {"tags": 3, "tag": 1, "dogs": 1}])
+    def test_every_output_listed(self, feed_settings, paginate):
+        settings = dict(feed_settings, paginate=paginate)
+        written = render_site(build_site(settings))
+        urls = {
+            loc.text for loc in parse(settings, "sitemap.xml").iter(f"{SITEMAP}loc")
+        }
+
+        assert "https://www.example.org/top" in urls
+        assert "https://www.example.org/tags/index.html" in urls
+        assert ("https://www.example.org/tags/page/2/index.html" in urls) == bool(
+            paginate
+        )
+        assert len(urls) == len([out for out in written if not out.endswith(".xml")])
+
+    def test_split(self, feed_settings):
+        settings = dict(feed_settings, sitemap={"limit": 5})
+        render_site(build_site(settings))
+        index = parse(settings, "sitemap.xml")
+
+        parts = [loc.text for loc in index.iter(f"{SITEMAP}loc")]
+        assert index.tag == f"{SITEMAP}sitemapindex"
+        assert parts[0] == "https://www.example.org/sitemap-1.xml"
+
+        urls = []
+        for n in range(1, len(parts) + 1):
+            urls += list(parse(settings, f"sitemap-{n}.xml").iter(f"{SITEMAP}loc"))
+        assert len(urls) > 5
+
+    def test_incremental_skips_fresh(self, feed_settings):
+        for expected in (None, 0):
+            manifest = Manifest(feed_settings)
+            written = render_site(build_site(feed_settings, manifest), manifest)
+            manifest.save()
+
+        assert [out for out in written if out.endswith(".xml")] == []
@@ -0,0 +1,141 @@
+import os
+
+import pytest
+
+from litesite.assets import copy_assets
+from litesite.content import Site
+from litesite.images import Derivative, process_images
+from litesite.renderers import Renderer
+
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def image_settings(tmp_path):
+    static = tmp_path / "static"
+    (static / "img").mkdir(parents=True)
+    Image.new("RGB", (1000, 500), "red").save(static / "img" / "photo.jpg")
+
+    return {
+        "static": str(static),
+        "site": str(tmp_path / "site"),
+        "cache_dir": str(tmp_path / "cache"),
+        "images": {"widths": [200, 400, 2000], "formats": ["webp"]},
+    }
+
+
+def process(settings):
+    assets, _ = copy_assets(settings)
+    return process_images(settings, assets)
+
+
+class TestImages:
+    def test_derivatives(self, image_settings):
+        images = process(image_settings)
+        names = {image.url for image in images["img/photo.jpg"]}
+
+        assert names == {
+            "img/photo-200w.jpg",
+            "img/photo-400w.jpg",
+            "img/photo-200w.webp",
+            "img/photo-400w.webp",
+            "img/photo-1000w.webp",
+        }
+
+        with Image.open(
+            os.path.join(image_settings["site"], "img/photo-400w.jpg")
+        ) as im:
+            assert im.size == (400, 200)
+
+    def test_cached(self, image_settings, monkeypatch):
+        process(image_settings)
+
+        import litesite.images
+
+        def fail(*args):
+            raise AssertionError("derivatives generated again")
+
+        monkeypatch.setattr(litesite.images, "make_task", fail)
+
+        assert process(image_settings)["img/photo.jpg"]
+
+    def test_parallel(self, image_settings):
+        Image.new("RGB", (600, 300)).save(
+            os.path.join(image_settings["static"], "b.png")
+        )
+        images = process(dict(image_settings, workers=2))
+
+        assert {image.url for image in images["b.png"]} >= {"b-200w.png", "b-600w.webp"}
+
+    def test_changed_image_pruned(self, image_settings):
+        process(image_settings)
+        cache = os.path.join(image_settings["cache_dir"], "images")
+        before = set(os.listdir(cache))
+
+        source = os.path.join(image_settings["static"], "img", "photo.jpg")
+        Image.new("RGB", (1000, 500), "blue").save(source)
+        process(image_settings)
+        after = set(os.listdir(cache))
+
+        assert len(after) == len(before)
+        assert before & after == {"index.json"}
+
+    def test_original_format_encoded_once(self, image_settings, monkeypatch):
+        settings = dict(image_settings, images={"widths": [200], "formats": ["jpg"]})
+        saved = []
+        save = Image.Image.save
+
+        def counted(self, fp, *args, **kwargs):
+            saved.append(fp)
+            return save(self, fp, *args, **kwargs)
+
+        monkeypatch.setattr(Image.Image, "save", counted)
+        images = process(settings)
+
+        assert len(saved) == 2
+        assert [image.url for image in images["img/photo.jpg"]] == [
+            "img/photo-200w.jpg",
+            "img/photo-1000w.jpg",
+        ]
+
+    def test_pillow_missing(self, image_settings, monkeypatch):
+        import importlib.util
+
+        monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+
+        with pytest.raises(ImportError, match=r"litesite\[images\]"):
+            process(image_settings)
+
+    def test_disabled(self, image_settings):
+        settings = dict(image_settings, images=None)
+
+        assert process(settings) == {}
+
+
+class TestImageFilters:
+    @pytest.fixture
+    def site(self, tmp_path):
+        site = Site({})
+        site.images = {
+            "img/a.jpg": [
+                Derivative("img/a-200w.jpg", 200, "jpg"),
+                Derivative("img/a-200w.webp", 200, "webp"),
+            ]
+        }
+        return site
+
+    def test_srcset(self, site):
+        text = Renderer.render_from_string("{{ '/img/a.jpg'|srcset }}", {"site": site})
+
+        assert text == "/img/a-200w.jpg 200w"
+
+    def test_responsive(self, site):
+        content = '<p><img alt="a" src="/img/a.jpg"/> <img src="other.png"></p>'
+        string = "{{ content|responsive('50vw') }}"
+        text = Renderer.render_from_string(string, {"site": site, "content": content})
+
+        assert text == (
+            '<p><picture><source type="image/webp" srcset="/img/a-200w.webp 200w" '
+            'sizes="50vw"><img alt="a" src="/img/a.jpg" srcset="/img/a-200w.jpg 200w" '
+            'sizes="50vw"/></picture> <img src="other.png"></p>'
+        )
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+## Packages which should only load when the feature using them runs
+HEAVY = [
+    "PIL",
+    "asyncio",
+    "concurrent.futures.process",
+    "dateutil",
+    "http.server",
+    "jinja2",
+    "markdown",
+    "multiprocessing",
+    "pygments",
+]
+
+## Import time budget for `litesite.cli` in milliseconds. The default
+## is generous enough for slow CI machines, while still catching a
+## heavy dependency imported at startup.
+BUDGET = float(os.environ.get("LITESITE_IMPORT_BUDGET_MS", 500))
+
+
+def import_time(module):
+    """Return the time taken to import `module` in a fresh interpreter, in ms."""
+
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    return float(out.stdout) * 1000
+
+
+class TestImports:
+    def test_heavy_dependencies_not_imported(self):
+        code = "import sys, litesite.cli; print('\\n'.join(sys.modules))"
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        modules = set(out.stdout.split())
+
+        assert [name for name in HEAVY if name in modules] == []
+
+    def test_import_budget(self):
+        assert min(import_time("litesite.cli") for _ in range(3)) < BUDGET
@@ -0,0 +1,143 @@
+import os
+import shutil
+
+from litesite.builder import build_site, render_site
+from litesite.manifest import Manifest
+
+
+def incremental_build(settings):
+    manifest = Manifest(settings)
+    site = build_site(settings, manifest)
+    render_site(site, manifest)
+    manifest.save()
+
+    return manifest
+
+
+def assert_matches_full_build(settings, full):
+    render_site(build_site(full))
+
+    for root, dirs, files in os.walk(full["site"]):
+        for name in files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, full["site"])
+            with open(path) as a, open(os.path.join(settings["site"], rel)) as b:
+                assert a.read() == b.read()
+
+
+def rendered(capsys):
+    lines = capsys.readouterr().out.splitlines()
+    return [line for line in lines if not line.endswith(" unchanged")]
+
+
+class TestIncremental:
+    def test_first_build_renders_everything(self, render_settings, capsys):
+        incremental_build(render_settings)
+
+        assert "top_level_page" in rendered(capsys)
+
+    def test_unchanged_build_renders_nothing(self, render_settings, capsys):
+        incremental_build(render_settings)
+        capsys.readouterr()
+
+        manifest = incremental_build(render_settings)
+
+        assert rendered(capsys) == []
+        assert not manifest.changed
+
+    def test_changed_page_and_neighbours(self, render_settings, capsys):
+        incremental_build(render_settings)
+        capsys.readouterr()
+
+        source = os.path.join(render_settings["content"], "animals/dogs/samoyed.md")
+        with open(source, "a") as f:
+            f.write("\nSamoyed also like snow.\n")
+
+        manifest = incremental_build(render_settings)
+        names = rendered(capsys)
+
+        assert manifest.changed == {source}
+        assert set(names) == {"samoyed", "borzoi", "borzoi2", "_index"}
+
+    def test_changed_category_page(self, render_settings, capsys):
+        incremental_build(render_settings)
+        capsys.readouterr()
+
+        source = os.path.join(render_settings["content"], "categories/a_page.md")
+        with open(source, "a") as f:
+            f.write("\nMore text.\n")
+
+        incremental_build(render_settings)
+        names = rendered(capsys)
+
+        assert set(names) == {"a_page", "tags", "a", "b", "c"}
+
+    def test_template_change_renders_everything(self, render_settings, capsys):
+        incremental_build(render_settings)
+        capsys.readouterr()
+
+        template = os.path.join(render_settings["templates"], "page.html")
+        with open(template, "a") as f:
+            f.write("\n")
+
+        incremental_build(render_settings)
+
+        assert "top_level_page" in rendered(capsys)
+
+    def test_fingerprint_change_renders_everything(
+        self, render_settings, tmp_path, capsys
+    ):
+        static = tmp_path / "static"
+        static.mkdir()
+        (static / "style.css").write_text("body {}")
+        settings = dict(render_settings, static=str(static), fingerprint=True)
+
+        incremental_build(settings)
+        incremental_build(settings)
+        capsys.readouterr()
+
+        (static / "style.css").write_text("body { color: red }")
+        incremental_build(settings)
+
+        assert "top_level_page" in rendered(capsys)
+
+    def test_deleted_page_output_removed(self, render_settings, capsys):
+        incremental_build(render_settings)
+
+        source = os.path.join(render_settings["content"], "posts/post.md")
+        out = os.path.join(render_settings["site"], "posts/test_post")
+        assert os.path.exists(out)
+
+        os.remove(source)
+        incremental_build(render_settings)
+
+        assert not os.path.exists(out)
+
+    def test_output_matches_full_build(self, render_settings, tmp_path):
+        incremental_build(render_settings)
+        incremental_build(render_settings)
+
+        full = dict(render_settings, site=str(tmp_path / "full"))
+        assert_matches_full_build(render_settings, full)
+
+    def test_site_graph_change(self, render_settings, tmp_path):
+        templates = tmp_path / "templates"
+        shutil.copytree(render_settings["templates"], templates)
+        (templates / "page.html").write_text(
+            "{% for category in site.categories %}{% for item in category.items %}"
+            "{{ item.value }} {{ item.count }}\n{% endfor %}{% endfor %}"
+            "{% for page in site.pages %}{{ page.url }}\n{% endfor %}"
+        )
+        settings = dict(render_settings, templates=str(templates))
+        incremental_build(settings)
+
+        source = os.path.join(settings["content"], "categories/a_page.md")
+        with open(source) as f:
+            text = f.read()
+        with open(source, "w") as f:
+            f.write(text.replace("  - c", "  - d"))
+        os.remove(os.path.join(settings["content"], "posts/post.md"))
+        incremental_build(settings)
+
+        full = dict(settings, site=str(tmp_path / "full"))
+        assert_matches_full_build(settings, full)
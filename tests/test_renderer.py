@@ -2,7 +2,17 @@ import os
 
 import pytest
 
-from litesite.renderers import Renderer
+from litesite.builder import build_site, render_site
+from litesite.filters import canonify_media
+from litesite.renderers import (
+    CATEGORY_URL,
+    ITEM_URL,
+    PAGE_URL,
+    Renderer,
+    compile_string,
+    render_url,
+)
+from litesite.writers import Writer
 
 
 class TestStringRender:
@@ -12,6 +22,30 @@ class TestStringRender:
 
         assert text == "top_level_page"
 
+    def test_compiled_once(self):
+        string = "{{ 1 + 1 }}"
+
+        assert compile_string(string) is compile_string(string)
+
+
+class TestUrlRender:
+    def test_page_fast_path(self, site):
+        for page in site.pages:
+            args = {"page": page}
+            expected = Renderer.render_from_string(PAGE_URL, args)
+
+            assert render_url(PAGE_URL, args) == expected
+
+    def test_category_fast_paths(self, category):
+        args = {"category": category}
+        expected = Renderer.render_from_string(CATEGORY_URL, args)
+        assert render_url(CATEGORY_URL, args) == expected
+
+        for item in category.items:
+            args = {"item": item}
+            expected = Renderer.render_from_string(ITEM_URL, args)
+            assert render_url(ITEM_URL, args) == expected
+
 
 class TestTemplateRenderer:
     def test_template_selection(self, page, renderer):
@@ -103,3 +137,99 @@ class TestFilters:
         )
 
         assert text == expected
+
+    def test_canonify_media_srcset(self):
+        html = '<picture><source srcset="a.png 1x, /b.png 2x"></picture>'
+        text = canonify_media(html, "https://www.example.org/blog/")
+        expected = (
+            '<picture><source srcset="https://www.example.org/blog/a.png 1x, '
+            'https://www.example.org/b.png 2x"></picture>'
+        )
+
+        assert text == expected
+
+    def test_canonify_media_links(self):
+        html = "<a href=post>post</a> <audio src='/a.mp3'></audio>"
+        text = canonify_media(html, "https://www.example.org")
+        expected = (
+            '<a href="https://www.example.org/post">post</a> '
+            "<audio src='https://www.example.org/a.mp3'></audio>"
+        )
+
+        assert text == expected
+
+    def test_canonify_media_untouched(self):
+        html = (
+            '<p class="x">&amp; <img alt="a > b" data-src="x.png"> '
+            '<!-- <img src="/no.png"> --> <abbr title="t">t</abbr></p>'
+        )
+
+        assert canonify_media(html, "https://www.example.org") == html
+
+
+class TestTemplateCache:
+    def test_lookup_memoized(self, renderer):
+        templates = [None, "page"]
+
+        assert renderer.lookup(templates) is renderer.lookup(list(templates))
+
+    def test_precompile(self, renderer):
+        assert set(renderer.precompile()) >= {"page.html", "404.html"}
+
+    def test_precompile_skips_other_files(self, render_settings):
+        templates = render_settings["templates"]
+        with open(os.path.join(templates, "logo.png"), "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n\xff\xfe")
+        with open(os.path.join(templates, "broken.html"), "w") as f:
+            f.write("{% if %}")
+
+        names = Renderer(render_settings).precompile()
+
+        assert "page.html" in names
+        assert "logo.png" not in names
+        assert "broken.html" not in names
+
+    def test_parallel_render_ignores_other_files(self, render_settings):
+        with open(os.path.join(render_settings["templates"], "logo.png"), "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n\xff\xfe")
+        with open(os.path.join(render_settings["templates"], "unused.html"), "w") as f:
+            f.write("{% if %}")
+
+        settings = dict(render_settings, progress="quiet", workers=2)
+        assert render_site(build_site(settings))
+
+    def test_bytecode_cache(self, render_settings):
+        settings = dict(render_settings, cache=True)
+        Renderer(settings).precompile()
+
+        directory = os.path.join(settings["cache_dir"], "templates")
+        assert os.listdir(directory)
+
+
+class TestWriter:
+    def test_skips_unchanged(self, tmp_path):
+        writer = Writer()
+        out = str(tmp_path / "a" / "page")
+
+        assert writer.write(out, "text")
+        mtime = os.stat(out).st_mtime_ns
+
+        assert not writer.write(out, "text")
+        assert os.stat(out).st_mtime_ns == mtime
+        assert (writer.written, writer.skipped) == (1, 1)
+
+    def test_rewrites_changed(self, tmp_path):
+        writer = Writer()
+        out = str(tmp_path / "page")
+
+        writer.write(out, "text")
+        assert writer.write(out, "texts")
+
+        with open(out) as f:
+            assert f.read() == "texts"
+
+    def test_no_temp_files_left(self, tmp_path):
+        writer = Writer()
+        writer.write(str(tmp_path / "page"), "text")
+
+        assert os.listdir(tmp_path) == ["page"]
@@ -0,0 +1,154 @@
+import json
+import os
+
+import pytest
+
+from litesite.builder import build_site, render_site
+from litesite.manifest import Manifest
+from litesite.readers import ContentLoader
+from litesite.search import SearchIndex, search_options, tokenize
+
+
+@pytest.fixture
+def search_settings(render_settings):
+    return dict(render_settings, search=True, progress="quiet")
+
+
+def load(settings, name):
+    with open(os.path.join(settings["site"], "search", name)) as f:
+        return json.load(f)
+
+
+def lookup(settings, term):
+    meta = load(settings, "index.json")
+    shard = term[: meta["prefix"]]
+    if shard not in meta["shards"]:
+        return []
+
+    docs = load(settings, "docs.json")
+    postings = load(settings, f"shards/{shard}.json").get(term, [])
+    return [(docs[str(doc)][0], score) for doc, score in postings]
+
+
+class TestSearch:
+    def test_tokenize(self):
+        text = "<p>Borzoi &amp; <em>Samoyed</em> dogs, a b</p>"
+
+        assert tokenize(text) == ["borzoi", "samoyed", "dogs"]
+
+    def test_options(self):
+        assert search_options({}) is None
+        assert search_options({"search": True})["prefix"] == 2
+
+        opts = search_options({"search": {"fields": ["title", "tags"]}})
+        assert opts["fields"] == {"title": 1, "tags": 1}
+
+    def test_index(self, search_settings):
+        render_site(build_site(search_settings))
+
+        urls = dict(lookup(search_settings, "borzoi"))
+        assert set(urls) == {"animals/dogs/borzoi", "animals/dogs/borzoi2"}
+
+        ## Title matches are weighted above body matches
+        assert urls["animals/dogs/borzoi"] == 5 + 1
+        assert lookup(search_settings, "clouds") == [("animals/dogs/samoyed", 1)]
+        assert lookup(search_settings, "articles") == []
+
+    def test_sharded(self, search_settings):
+        render_site(build_site(search_settings))
+        meta = load(search_settings, "index.json")
+
+        for shard in meta["shards"]:
+            terms = load(search_settings, f"shards/{shard}.json")
+            assert terms
+            assert all(term.startswith(shard) for term in terms)
+
+    def test_long_prefix(self, search_settings):
+        settings = dict(search_settings, search={"prefix": 5})
+        text = "---\ntitle: Index\nslug: idx\n---\n\nDocs for the index.\n"
+        with open(os.path.join(settings["content"], "posts", "idx.md"), "w") as f:
+            f.write(text)
+
+        render_site(build_site(settings))
+
+        ## Shards named like the index files don't replace them
+        assert load(settings, "index.json")["prefix"] == 5
+        assert "posts/idx" in [url for url, _ in load(settings, "docs.json").values()]
+        assert lookup(settings, "index") == [("posts/idx", 6)]
+        assert lookup(settings, "docs") == [("posts/idx", 1)]
+
+    def test_incremental(self, search_settings):
+        manifest = Manifest(search_settings)
+        render_site(build_site(search_settings, manifest), manifest)
+        manifest.save()
+
+        directory = os.path.join(search_settings["site"], "search", "shards")
+        mtimes = {
+            name: os.stat(os.path.join(directory, name)).st_mtime_ns
+            for name in os.listdir(directory)
+        }
+
+        source = os.path.join(
+            search_settings["content"], "animals", "dogs", "samoyed.md"
+        )
+        with open(source, "w") as f:
+            f.write(
+                "---\ntitle: Samoyed\nslug: samoyed\ndate: 2013-01-01\n---\n\nSamoyed are fluffy.\n"
+            )
+
+        manifest = Manifest(search_settings)
+        written = render_site(build_site(search_settings, manifest), manifest)
+
+        assert lookup(search_settings, "fluffy") == [("animals/dogs/samoyed", 1)]
+        assert lookup(search_settings, "clouds") == []
+        assert not os.path.exists(os.path.join(directory, "cl.json"))
+
+        ## Shards without terms of the changed page are left alone
+        rewritten = {
+            os.path.basename(out) for out in written if out.startswith(directory)
+        }
+        assert "fl.json" in rewritten
+        assert "bo.json" not in rewritten
+        assert (
+            os.stat(os.path.join(directory, "bo.json")).st_mtime_ns == mtimes["bo.json"]
+        )
+
+    def test_tied_postings_ordered(self, search_settings):
+        index = SearchIndex(search_settings, search_options(search_settings))
+        touched = set()
+        index.add("x", "1", {"tie": 1}, touched)
+        index.add("y", "1", {"tie": 1}, touched)
+
+        ## Updating a page moves it to the end of the postings
+        index.remove("x", touched)
+        index.add("x", "2", {"tie": 1}, touched)
+
+        shards = index.shard_json(["ti"])
+        assert json.loads(shards["ti"]) == {"tie": [[0, 1], [1, 1]]}
+
+    def test_stream_unchanged_not_converted(self, search_settings, monkeypatch):
+        settings = dict(search_settings, stream=True)
+        render_site(build_site(settings))
+
+        loads = []
+        load = ContentLoader.load
+        monkeypatch.setattr(
+            ContentLoader, "load", lambda self, s: loads.append(s) or load(self, s)
+        )
+
+        render_site(build_site(dict(settings, search=False)))
+        rendered = len(loads)
+        render_site(build_site(settings))
+
+        assert len(loads) == 2 * rendered
+
+    def test_removed_page(self, search_settings):
+        render_site(build_site(search_settings))
+        os.remove(
+            os.path.join(search_settings["content"], "animals", "dogs", "borzoi2.md")
+        )
+        render_site(build_site(search_settings))
+
+        assert dict(lookup(search_settings, "borzoi")).keys() == {"animals/dogs/borzoi"}
+        docs = load(search_settings, "docs.json")
+        assert "animals/dogs/borzoi2" not in [url for url, _ in docs.values()]
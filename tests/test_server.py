@@ -0,0 +1,156 @@
+import os
+import threading
+import urllib.request
+
+import pytest
+
+from litesite import server
+from litesite.server import LiveReload, LiveSite, RELOAD_SCRIPT, make_server, watch
+from litesite.watcher import InotifyWatcher, PollingWatcher
+
+
+@pytest.fixture
+def live(render_settings, capsys):
+    live = LiveSite(render_settings)
+    capsys.readouterr()
+
+    return live
+
+
+def output(settings, url):
+    with open(os.path.join(settings["site"], url)) as f:
+        return f.read()
+
+
+class TestLiveSite:
+    def test_modified_page(self, live, render_settings, capsys):
+        source = os.path.join(render_settings["content"], "top_level_page.md")
+        with open(source, "a") as f:
+            f.write("\nAn edit.\n")
+
+        live.update({source})
+
+        assert capsys.readouterr().out.splitlines()[0] == "top_level_page"
+        assert "An edit." in output(render_settings, "./top")
+
+    def test_modified_category_page(self, live, render_settings, capsys):
+        source = os.path.join(render_settings["content"], "categories/b_page.md")
+        with open(source) as f:
+            text = f.read()
+        with open(source, "w") as f:
+            f.write(text.replace("  - d\n", "  - e\n"))
+
+        live.update({source})
+
+        assert "e 1" in output(render_settings, "tags/index.html")
+        assert not os.path.exists(os.path.join(render_settings["site"], "tags/d"))
+
+    def test_added_page(self, live, render_settings):
+        source = os.path.join(render_settings["content"], "posts/new.md")
+        with open(source, "w") as f:
+            f.write("---\ntitle: New\nslug: new\n---\n\nA new post.\n")
+
+        live.update({source})
+
+        assert "A new post." in output(render_settings, "posts/new")
+
+    def test_failed_update(self, live, render_settings):
+        source = os.path.join(render_settings["content"], "top_level_page.md")
+        with open(source) as f:
+            text = f.read()
+        with open(source, "w") as f:
+            f.write("---\ntitle: [unclosed\n---\n")
+
+        with pytest.raises(Exception):
+            live.update({source})
+
+        assert live.pending == {source}
+        assert os.path.exists(os.path.join(render_settings["site"], "top"))
+
+        ## Fixed, and retried along with the next change
+        with open(source, "w") as f:
+            f.write(text + "\nFixed.\n")
+        live.update(set())
+
+        assert not live.pending
+        assert "Fixed." in output(render_settings, "./top")
+
+
+class FakeWatcher:
+    """Watcher which runs one edit per wait, then stops watching."""
+
+    def __init__(self, edits):
+        self.edits = list(edits)
+
+    def wait(self, timeout=None):
+        if not self.edits:
+            raise KeyboardInterrupt
+        return self.edits.pop(0)()
+
+    def close(self):
+        pass
+
+
+class TestWatch:
+    @pytest.mark.parametrize("progress", [None, "quiet", "bar"])
+    def test_keeps_watching_after_error(
+        self, render_settings, progress, monkeypatch, capsys
+    ):
+        source = os.path.join(render_settings["content"], "top_level_page.md")
+        with open(source) as f:
+            text = f.read()
+
+        def edit(new):
+            def save():
+                with open(source, "w") as f:
+                    f.write(new)
+                return {source}
+
+            return save
+
+        edits = [edit("---\ntitle: [unclosed\n---\n"), edit(text + "\nSaved again.\n")]
+        monkeypatch.setattr(server, "watcher", lambda paths: FakeWatcher(edits))
+
+        updates = []
+        settings = dict(render_settings, progress=progress)
+        watch(settings, on_update=lambda: updates.append(1))
+
+        captured = capsys.readouterr()
+        assert "Watching for changes" in captured.out
+        assert "Rebuild failed: " in captured.err
+        assert len(updates) == 1
+        assert "Saved again." in output(settings, "./top")
+
+
+class TestWatchers:
+    @pytest.mark.parametrize("cls", [InotifyWatcher, PollingWatcher])
+    def test_detects_change(self, cls, settings):
+        try:
+            files = cls([settings["content"]])
+        except (OSError, AttributeError):
+            pytest.skip("watcher unavailable")
+
+        source = os.path.join(settings["content"], "posts/post.md")
+        with open(source, "a") as f:
+            f.write("\nMore.\n")
+
+        assert source in files.wait(timeout=2)
+        files.close()
+
+
+class TestServer:
+    def test_injects_reload_script(self, live, render_settings):
+        server = make_server(render_settings, "localhost", 0, LiveReload())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            url = f"http://localhost:{server.server_address[1]}/top"
+            with urllib.request.urlopen(url) as response:
+                body = response.read()
+                content_type = response.headers["Content-Type"]
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert content_type.startswith("text/html")
+        assert body.endswith(RELOAD_SCRIPT)
@@ -0,0 +1,183 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from litesite.builder import build_site, render_site
+from litesite.cli import parse_args
+from litesite.manifest import Manifest
+from litesite.shards import assign, check_manifests, manifest_path, parse_shard
+from litesite.snapshot import load_snapshot, write_snapshot
+
+
+@pytest.fixture
+def shard_settings(render_settings):
+    return dict(
+        render_settings, progress="quiet", sitemap=True, base_url="https://example.org/"
+    )
+
+
+def render_shards(settings, count):
+    manifests = []
+    for index in range(1, count + 1):
+        render_site(build_site(dict(settings, shard=[index, count])))
+        with open(manifest_path(settings, index, count)) as f:
+            manifests.append(json.load(f))
+
+    return manifests
+
+
+class TestAssign:
+    def test_parse(self):
+        assert parse_shard("2/3") == (2, 3)
+        assert parse_shard([1, 1]) == (1, 1)
+
+        for value in ("0/3", "4/3", "1", "a/b"):
+            with pytest.raises(ValueError):
+                parse_shard(value)
+
+    def test_cli(self, tmp_path):
+        config = tmp_path / "config.yaml"
+        config.write_text("content: content\n")
+
+        assert parse_args([str(config), "--shard", "1/2"]).shard == (1, 2)
+        with pytest.raises(SystemExit):
+            parse_args([str(config), "--shard", "3/2"])
+
+    def test_deterministic(self):
+        costs = {f"page{i}": i % 7 + 1 for i in range(200)}
+
+        assert assign(costs, 4) == assign(dict(reversed(list(costs.items()))), 4)
+
+    def test_balanced(self):
+        costs = {f"page{i}": 1000 if i < 8 else 1 for i in range(400)}
+        shards = assign(costs, 4)
+
+        loads = [
+            sum(costs[url] for url in shards if shards[url] == k) for k in range(1, 5)
+        ]
+        assert max(loads) <= 1.1 * sum(costs.values()) / 4
+        assert sorted(shards[f"page{i}"] for i in range(8)) == [1, 1, 2, 2, 3, 3, 4, 4]
+
+
+class TestShardedBuild:
+    def test_cover(self, shard_settings):
+        render_site(build_site(shard_settings))
+        everything = set()
+        for root, _, files in os.walk(shard_settings["site"]):
+            everything.update(
+                os.path.normpath(os.path.join(root, name)) for name in files
+            )
+
+        manifests = render_shards(shard_settings, 3)
+        assert check_manifests(manifests) == []
+
+        outputs = [url for m in manifests for url in m["outputs"]]
+        assert len(outputs) == len(set(outputs)) == manifests[0]["total"]
+        paths = {
+            os.path.normpath(os.path.join(shard_settings["site"], url))
+            for url in outputs
+        }
+        assert paths <= everything
+        assert all(m["outputs"] for m in manifests)
+
+    def test_incremental_keeps_other_shards(self, shard_settings):
+        def outputs():
+            return {
+                os.path.join(root, name)
+                for root, _, files in os.walk(shard_settings["site"])
+                for name in files
+            }
+
+        manifest = Manifest(shard_settings)
+        render_site(build_site(shard_settings, manifest), manifest)
+        manifest.save()
+        full = outputs()
+
+        for index in (1, 2, 1):
+            settings = dict(shard_settings, shard=[index, 2])
+            manifest = Manifest(settings)
+            render_site(build_site(settings, manifest), manifest)
+            manifest.save()
+
+            assert outputs() == full
+
+        ## Shards keep their own manifests, so the full build is still fresh
+        manifest = Manifest(shard_settings)
+        assert render_site(build_site(shard_settings, manifest), manifest) == []
+
+    def test_merge_errors(self, shard_settings):
+        manifests = render_shards(shard_settings, 3)
+
+        assert check_manifests(manifests[:2]) == ["shard 3/3 is missing"]
+        assert "shard 2/3 is given more than once" in check_manifests(
+            manifests + [manifests[1]]
+        )
+
+        other = render_shards(shard_settings, 2)
+        assert check_manifests(manifests[:2] + other[1:])
+
+        dropped = dict(manifests[0], outputs=manifests[0]["outputs"][1:])
+        assert check_manifests([dropped] + manifests[1:])
+
+
+class TestSnapshot:
+    def test_render_from_snapshot(self, shard_settings, tmp_path):
+        path = str(tmp_path / "site.pickle")
+        write_snapshot(shard_settings, path)
+
+        ## Content changes after the snapshot are not picked up
+        source = os.path.join(
+            shard_settings["content"], "animals", "dogs", "samoyed.md"
+        )
+        with open(source, "a") as f:
+            f.write("\nChanged after the snapshot.\n")
+
+        settings = dict(shard_settings, snapshot=path)
+        render_site(build_site(settings))
+
+        with open(
+            os.path.join(shard_settings["site"], "animals", "dogs", "samoyed")
+        ) as f:
+            text = f.read()
+        assert "giant white clouds" in text
+        assert "Changed after" not in text
+
+    def test_settings_mismatch(self, shard_settings, tmp_path):
+        path = str(tmp_path / "site.pickle")
+        write_snapshot(shard_settings, path)
+
+        assert load_snapshot(path, dict(shard_settings, workers=4, shard=[1, 2]))
+        with pytest.raises(ValueError):
+            load_snapshot(path, dict(shard_settings, categories={}))
+
+    def test_plan_from_snapshot(self, shard_settings, tmp_path):
+        ## One large page, so balancing depends on source sizes
+        source = os.path.join(shard_settings["content"], "animals", "dogs", "borzoi.md")
+        with open(source, "a") as f:
+            f.write("\nLong. " * 20000)
+
+        path = str(tmp_path / "site.pickle")
+        write_snapshot(shard_settings, path)
+        settings = dict(shard_settings, snapshot=path)
+
+        manifests = render_shards(settings, 2)[:1]
+
+        ## A shard without the content directory computes the same plan
+        shutil.rmtree(shard_settings["content"])
+        manifests += render_shards(settings, 2)[1:]
+
+        assert check_manifests(manifests) == []
+
+    def test_incremental(self, shard_settings, tmp_path):
+        path = str(tmp_path / "site.pickle")
+        write_snapshot(shard_settings, path)
+        settings = dict(shard_settings, snapshot=path)
+
+        manifest = Manifest(settings)
+        render_site(build_site(settings, manifest), manifest)
+        manifest.save()
+
+        manifest = Manifest(settings)
+        assert render_site(build_site(settings, manifest), manifest) == []
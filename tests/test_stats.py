@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from litesite.builder import build_site, render_site
+from litesite.stats import NULL_TIMER, Stats, stats
+
+
+@pytest.fixture
+def enabled():
+    stats.reset()
+    stats.enable()
+    yield stats
+    stats.enabled = False
+    stats.reset()
+
+
+class TestStats:
+    def test_disabled_timer(self):
+        assert Stats().timer("phase") is NULL_TIMER
+
+    def test_timer(self):
+        recorder = Stats()
+        recorder.enabled = True
+
+        for _ in range(3):
+            with recorder.timer("phase"):
+                pass
+
+        assert recorder.phases["phase"][1] == 3
+
+    def test_slowest_bounded(self):
+        recorder = Stats(slowest=2)
+        for i in range(5):
+            recorder.page(f"page{i}", i)
+
+        names = [entry["name"] for entry in recorder.as_dict()["slowest"]]
+        assert names == ["page4", "page3"]
+
+    def test_merge(self):
+        a, b = Stats(), Stats()
+        a.enabled = b.enabled = True
+
+        with a.timer("phase"):
+            pass
+        with b.timer("phase"):
+            pass
+
+        a.merge(b.drain())
+
+        assert a.phases["phase"][1] == 2
+        assert not b.phases
+
+
+class TestBuildStats:
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_build_recorded(self, enabled, render_settings, workers):
+        settings = dict(render_settings, progress="quiet", workers=workers)
+        render_site(build_site(settings))
+
+        data = json.loads(json.dumps(enabled.as_dict()))
+
+        assert data["phases"]["load_content"]["calls"] == 1
+        assert data["phases"]["markdown"]["calls"] == 9
+        assert data["templates"]["page.html"]["calls"] == 9
+        assert data["slowest"]
+
+    def test_phases_distinct(self, enabled, render_settings):
+        settings = dict(
+            render_settings, progress="quiet", sitemap=True, base_url="https://a/"
+        )
+        render_site(build_site(settings))
+
+        for phase in (
+            "render_jobs",
+            "feed_outputs",
+            "fresh_jobs",
+            "fresh_feeds",
+            "write_feeds",
+        ):
+            assert enabled.phases[phase][1] == 1